@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
@@ -10,6 +11,67 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL: str
     CHROMA_PATH: str
 
+    # --- Arranque en caliente ---
+    # Segundos que Ollama mantiene los modelos cargados en memoria entre peticiones (-1 = siempre).
+    OLLAMA_KEEP_ALIVE: int = 1800
+    # Si es True, al iniciar la API se abre Chroma y se "calientan" los modelos.
+    WARMUP_ON_STARTUP: bool = True
+    # Backoff exponencial entre reintentos de inicialización (segundos).
+    INIT_RETRY_BASE_DELAY: float = 1.0
+    INIT_RETRY_MAX_DELAY: float = 60.0
+
+    # --- Despliegue multi-worker ---
+    # Si se define CHROMA_SERVER_HOST, los workers usan un servidor Chroma compartido
+    # (chroma run --path ...) en vez de abrir CHROMA_PATH cada uno por su cuenta.
+    CHROMA_SERVER_HOST: Optional[str] = None
+    CHROMA_SERVER_PORT: int = 8001
+    CHROMA_COLLECTION: str = "langchain"  # Nombre por defecto que usa langchain_chroma.
+    # Cada cuántos segundos un worker comprueba si otro cambió el corpus (versión en la DB).
+    CORPUS_VERSION_POLL_SECONDS: float = 2.0
+
+    # --- Consultas en lote ---
+    # Generaciones simultáneas contra Ollama (debe coincidir con OLLAMA_NUM_PARALLEL del servidor).
+    OLLAMA_NUM_PARALLEL: int = 4
+    BATCH_MAX_QUESTIONS: int = 500
+    BATCH_COMMIT_EVERY: int = 20 # Resultados de un trabajo batch que se guardan juntos en la DB
+
+    # --- Backend vectorial ---
+    # "chroma" (por defecto) o "quantized": índice local int8 memory-mapped con re-scoring exacto.
+    VECTOR_STORE_BACKEND: str = "chroma"
+    QUANTIZED_INDEX_PATH: str = "./quantized_index"
+    # Candidatos int8 por resultado que se re-puntúan en float32 (k * factor).
+    QUANTIZED_RESCORE_FACTOR: int = 10
+    # Índice IVF: listas recorridas por consulta (0 = recorrido completo), cantidad de listas
+    # (0 = automático, ~sqrt(filas)) y filas a partir de las cuales se entrena.
+    QUANTIZED_IVF_NPROBE: int = 64
+    QUANTIZED_IVF_LISTS: int = 0
+    QUANTIZED_IVF_MIN_ROWS: int = 50000
+
+    # --- Chunking ---
+    # "legal": un fragmento por artículo (con metadata de artículo/capítulo/título).
+    # "recursive": corte genérico de 1000 caracteres con 200 de solapamiento.
+    CHUNKER: str = "legal"
+    CHUNK_MAX_CHARS: int = 1500
+    CHUNK_OVERLAP: int = 50  # Solo se usa al partir artículos que superan CHUNK_MAX_CHARS.
+
+    # --- Ruteo por tipo de consulta ---
+    # Las consultas puntuales ("¿está vigente...?") van a un modelo más chico y con límites ajustados;
+    # las de análisis, al modelo principal. FAST_OLLAMA_MODEL=None usa OLLAMA_MODEL con los límites rápidos.
+    ROUTING_ENABLED: bool = True
+    FAST_OLLAMA_MODEL: Optional[str] = None
+    FAST_NUM_PREDICT: int = 256
+    FAST_NUM_CTX: int = 4096
+    FAST_KEEP_ALIVE: int = 1800
+    MAIN_NUM_PREDICT: Optional[int] = None  # None = sin tope de salida
+    MAIN_NUM_CTX: Optional[int] = None      # None = contexto por defecto del modelo
+
+    # --- Resúmenes precalculados por documento ---
+    # Al subir un PDF se construye en segundo plano un árbol de resúmenes página -> sección -> documento.
+    SUMMARIES_ENABLED: bool = True
+    SUMMARY_SECTION_PAGES: int = 8  # Páginas por sección del árbol
+    SUMMARY_MAX_SECTIONS: int = 6   # Resúmenes de sección que entran en el prompt (acota su tamaño)
+    SUMMARY_MERGE_GROUP: int = 8    # Resúmenes que se combinan por llamada al subir en el árbol
+
     class Config:
         env_file = ".env"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
@@ -15,6 +15,26 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base para los modelos
 Base = declarative_base()
 
+def add_missing_columns():
+    """
+    create_all() crea las tablas nuevas pero no agrega columnas a tablas existentes.
+    Agrega (de forma idempotente) las columnas nullable que falten, p. ej. documents.retired_at
+    en bases creadas antes de que existiera. Columnas obligatorias requieren una migración manual.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"Columna agregada: {table.name}.{column.name}")
+
 # Dependencia de FastAPI para obtener la sesión de la DB
 def get_db():
     db = SessionLocal()
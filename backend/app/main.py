@@ -1,15 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
+from fastapi.responses import JSONResponse
+from .config import settings
+from .database import engine, Base, add_missing_columns
 from .routers import auth_router, chat_router, admin_router
+from .services import rag_service
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de la aplicación.
+    Al iniciar: crea las tablas y lanza en segundo plano el calentamiento de Chroma y Ollama,
+    de modo que el servidor acepta conexiones (liveness) mientras los modelos se cargan (readiness).
+    """
+    # Crear tablas en la base de datos (al inicio)
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns() # Columnas nuevas en tablas ya existentes (p. ej. documents.retired_at)
+
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(rag_service.warm_up_with_retry())
+
+    yield
 
-# Crear tablas en la base de datos (al inicio)
-Base.metadata.create_all(bind=engine)
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
 
 app = FastAPI(
     title="LegisBot API",
     description="API para gestionar usuarios, chat RAG y analíticas.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuración de CORS
@@ -31,3 +55,19 @@ app.include_router(admin_router.router, prefix="/api/admin", tags=["Administrado
 def read_root():
     """Verifica el estado de la API."""
     return {"status": "ok"}
+
+@app.get("/api/health/live", tags=["General"])
+def liveness():
+    """Liveness: el proceso está en pie y atiende peticiones HTTP."""
+    return {"status": "ok"}
+
+@app.get("/api/health/ready", tags=["General"])
+def readiness():
+    """
+    Readiness: Chroma está abierto y los modelos de Ollama están cargados.
+    Devuelve 503 mientras el calentamiento no haya terminado, junto con las métricas de arranque.
+    """
+    status = rag_service.get_readiness()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **status})
+    return {"status": "ready", **status}
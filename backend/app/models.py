@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, JSON, Enum as SQLEnum
+from sqlalchemy import Boolean, Column, Integer, Float, String, ForeignKey, DateTime, JSON, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -39,6 +39,7 @@ class Document(Base):
     filename = Column(String, nullable=False)
     upload_date = Column(DateTime, default=datetime.datetime.utcnow)
     admin_id = Column(Integer, ForeignKey("users.id"))
+    retired_at = Column(DateTime, nullable=True) # Documento retirado: sigue en SQL, pero ya no en el índice
 
 class ChatHistory(Base):
     __tablename__ = "chat_histories"
@@ -62,4 +63,55 @@ class Message(Base):
     sources = Column(JSON, nullable=True) # Para guardar de dónde sacó la info el RAG
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     
-    history = relationship("ChatHistory", back_populates="messages")
\ No newline at end of file
+    history = relationship("ChatHistory", back_populates="messages")
+
+class CorpusState(Base):
+    # Tabla clave/valor compartida entre workers (p. ej. "version" del corpus vectorial).
+    __tablename__ = "corpus_state"
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class BatchJobStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(SQLEnum(BatchJobStatus), default=BatchJobStatus.pending, nullable=False)
+    questions = Column(JSON, nullable=False)
+    completed_count = Column(Integer, default=0, nullable=False)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class BatchJobResult(Base):
+    # Una fila por pregunta respondida: el progreso se guarda sin reescribir el trabajo entero.
+    __tablename__ = "batch_job_results"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("batch_jobs.id"), index=True, nullable=False)
+    index = Column(Integer, nullable=False) # Posición de la pregunta en el lote original
+    result = Column(JSON, nullable=False)
+
+class GenerationMetric(Base):
+    # Una fila por respuesta generada: qué ruta/modelo la atendió y cuánto tardó.
+    __tablename__ = "generation_metrics"
+    id = Column(Integer, primary_key=True, index=True)
+    route = Column(String, index=True, nullable=False)
+    model = Column(String, nullable=False)
+    latency_ms = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class SummaryBuild(Base):
+    # Registro del precálculo de resúmenes de un documento (costo por página).
+    __tablename__ = "summary_builds"
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True, nullable=False)
+    pages = Column(Integer, nullable=False)
+    sections = Column(Integer, nullable=False)
+    build_seconds = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
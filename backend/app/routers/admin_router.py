@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
+import datetime
+import json
 
 from .. import schemas, models, database
-from ..services import auth_service
+from ..services import auth_service, export_service, rag_service, corpus_service, compaction_service
 
 router = APIRouter()
 
@@ -71,4 +74,170 @@ def get_top_queries(
         func.count(models.Message.id).desc()
     ).limit(20).all() # Top 20 consultas
     
-    return [schemas.DemographicStat(group=row.group, count=row.count) for row in stats]
\ No newline at end of file
+    return [schemas.DemographicStat(group=row.group, count=row.count) for row in stats]
+
+@router.get("/export/messages")
+def export_messages(
+    format: str = "ndjson",
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    after_id: Optional[int] = None,
+    chunk_size: int = 1000,
+    admin_user: models.User = Depends(auth_service.get_current_admin_user)
+):
+    """
+    (Solo Admin) Exporta todos los mensajes con sus fuentes para auditoría, en streaming.
+    format: 'ndjson' (un mensaje por línea) o 'columnar' (bloques de chunk_size mensajes por línea).
+    Filtra por fecha con start/end y se reanuda desde un id con after_id.
+    """
+    if format not in ["ndjson", "columnar"]:
+        raise HTTPException(status_code=400, detail="Formato no soportado. Use 'ndjson' o 'columnar'.")
+    if chunk_size < 1 or chunk_size > 50000:
+        raise HTTPException(status_code=400, detail="chunk_size debe estar entre 1 y 50000.")
+
+    def stream():
+        # Sesión propia: debe vivir mientras dure el streaming, no solo la petición.
+        db = database.SessionLocal()
+        try:
+            yield from export_service.iter_export(
+                db, format=format, start=start, end=end, after_id=after_id, chunk_size=chunk_size
+            )
+        finally:
+            db.close()
+
+    filename = f"legislatibot_messages.{format}.ndjson"
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/stats/routing", response_model=List[schemas.RoutingStat])
+def get_routing_stats(
+    admin_user: models.User = Depends(auth_service.get_current_admin_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    (Solo Admin) Cantidad de consultas y latencia promedio de generación por ruta y modelo.
+    Permite comparar el costo de las consultas puntuales (modelo rápido) contra las de análisis.
+    """
+    stats = db.query(
+        models.GenerationMetric.route,
+        models.GenerationMetric.model,
+        func.count(models.GenerationMetric.id).label("count"),
+        func.avg(models.GenerationMetric.latency_ms).label("avg_latency_ms")
+    ).group_by(
+        models.GenerationMetric.route, models.GenerationMetric.model
+    ).order_by(
+        func.count(models.GenerationMetric.id).desc()
+    ).all()
+
+    return [
+        schemas.RoutingStat(route=row.route, model=row.model, count=row.count, avg_latency_ms=row.avg_latency_ms)
+        for row in stats
+    ]
+
+@router.get("/stats/summaries", response_model=schemas.SummaryStats)
+def get_summary_stats(
+    admin_user: models.User = Depends(auth_service.get_current_admin_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    (Solo Admin) Costo del precálculo de resúmenes (segundos por página) y latencia de generación
+    de las preguntas sobre documentos completos contra las consultas de análisis con fragmentos
+    (en ambos casos se mide solo el modelo, sin la recuperación).
+    """
+    builds = db.query(
+        func.count(func.distinct(models.SummaryBuild.document_id)).label("documents"),
+        func.coalesce(func.sum(models.SummaryBuild.pages), 0).label("pages"),
+        func.coalesce(func.sum(models.SummaryBuild.build_seconds), 0.0).label("build_seconds")
+    ).one()
+
+    latencies = dict(
+        db.query(
+            models.GenerationMetric.route,
+            func.avg(models.GenerationMetric.latency_ms)
+        ).filter(
+            models.GenerationMetric.route.in_(["summary", "analytical"])
+        ).group_by(models.GenerationMetric.route).all()
+    )
+    summary_queries = db.query(func.count(models.GenerationMetric.id)).filter(
+        models.GenerationMetric.route == "summary"
+    ).scalar()
+
+    return schemas.SummaryStats(
+        documents=builds.documents,
+        pages=builds.pages,
+        build_seconds=builds.build_seconds,
+        avg_build_seconds_per_page=builds.build_seconds / builds.pages if builds.pages else None,
+        summary_queries=summary_queries,
+        avg_summary_latency_ms=latencies.get("summary"),
+        avg_analytical_latency_ms=latencies.get("analytical")
+    )
+
+# --- Documentos y corpus ---
+
+@router.get("/documents", response_model=List[schemas.DocumentInfo])
+def list_documents(
+    admin_user: models.User = Depends(auth_service.get_current_admin_user),
+    db: Session = Depends(database.get_db)
+):
+    """(Solo Admin) Lista los documentos subidos, incluidos los retirados."""
+    return db.query(models.Document).order_by(models.Document.id.desc()).all()
+
+def _get_document(db: Session, document_id: int) -> models.Document:
+    document = db.query(models.Document).filter(models.Document.id == document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    return document
+
+@router.delete("/documents/{document_id}", response_model=schemas.DocumentRemoval)
+def delete_document(
+    document_id: int,
+    admin_user: models.User = Depends(auth_service.get_current_admin_user),
+    db: Session = Depends(database.get_db)
+):
+    """(Solo Admin) Elimina un documento: borra sus fragmentos del índice y su registro."""
+    result = rag_service.remove_document(db, _get_document(db, document_id), retire=False)
+    return schemas.DocumentRemoval(document_id=document_id, **result)
+
+@router.post("/documents/{document_id}/retire", response_model=schemas.DocumentRemoval)
+def retire_document(
+    document_id: int,
+    admin_user: models.User = Depends(auth_service.get_current_admin_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    (Solo Admin) Retira un documento (p. ej. un proyecto reemplazado): sus fragmentos dejan de
+    estar en el índice, pero el registro se conserva marcado como retirado.
+    """
+    document = _get_document(db, document_id)
+    if document.retired_at:
+        raise HTTPException(status_code=400, detail="El documento ya está retirado")
+    result = rag_service.remove_document(db, document, retire=True)
+    return schemas.DocumentRemoval(document_id=document_id, **result)
+
+@router.get("/corpus", response_model=schemas.CorpusStatus)
+def get_corpus_status(
+    admin_user: models.User = Depends(auth_service.get_current_admin_user),
+    db: Session = Depends(database.get_db)
+):
+    """(Solo Admin) Versión del corpus, ubicación activa del índice y último informe de compactación."""
+    last_compaction = corpus_service.get_state(db, corpus_service.LAST_COMPACTION_KEY)
+    return schemas.CorpusStatus(
+        version=corpus_service.get_corpus_version(db),
+        store_location=corpus_service.get_store_location(db),
+        last_compaction=json.loads(last_compaction) if last_compaction else None
+    )
+
+@router.post("/corpus/compact", status_code=status.HTTP_202_ACCEPTED)
+def compact_corpus(
+    background_tasks: BackgroundTasks,
+    admin_user: models.User = Depends(auth_service.get_current_admin_user)
+):
+    """
+    (Solo Admin) Lanza la compactación del índice en segundo plano.
+    El informe (tamaño en disco y latencia antes/después) queda disponible en GET /corpus.
+    """
+    background_tasks.add_task(compaction_service.run_compaction_job)
+    return {"message": "Compactación iniciada. Consulte /api/admin/corpus para ver el resultado."}
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Iterable, AsyncIterator, Dict, Any
+import asyncio
+import json
 
-from .. import schemas, models, database
-from ..services import auth_service, rag_service
+from .. import schemas, models, database, config
+from ..services import auth_service, rag_service, summary_service
 
 router = APIRouter()
+settings = config.settings
 
 # ### CAMBIO IMPORTANTE: Agregamos 'async' antes de def
 @router.post("/query", response_model=schemas.ChatResponse)
@@ -35,12 +39,14 @@ async def handle_chat_query(
         # 2. Loguear pregunta del usuario
         rag_service.log_chat_message(db, history.id, models.SenderType.user, request.query)
         
-        # 3. Obtener documentos relevantes (Esto sigue siendo síncrono en el servicio porque es rápido)
-        sources = rag_service.get_relevant_documents(request.query)
+        # 3. Obtener documentos relevantes. La pregunta se vectoriza una sola vez: el mismo contexto
+        # (y su embedding) se usa para las fuentes y para la respuesta.
+        docs, embedding = await asyncio.to_thread(rag_service.retrieve_context, request.query)
+        sources = rag_service.docs_to_sources(docs)
         
         # ### CAMBIO CRÍTICO: Eliminamos chain.invoke() y usamos la nueva función asíncrona
         # Esto libera al servidor para atender a otros mientras la IA "piensa".
-        answer = await rag_service.generate_rag_response(request.query)
+        answer = await rag_service.generate_rag_response(request.query, db, docs, embedding)
         
         # 4. Loguear respuesta del bot
         rag_service.log_chat_message(db, history.id, models.SenderType.bot, answer, sources)
@@ -56,6 +62,109 @@ async def handle_chat_query(
         raise HTTPException(status_code=500, detail=f"Error al procesar la consulta: {str(e)}")
 
 
+# --- Consultas en lote ---
+
+def _validate_batch(request: schemas.BatchQueryRequest) -> List[str]:
+    questions = [q.strip() for q in request.questions if q.strip()]
+    if not questions:
+        raise HTTPException(status_code=400, detail="No se enviaron preguntas.")
+    if len(questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote supera el máximo de {settings.BATCH_MAX_QUESTIONS} preguntas."
+        )
+    return questions
+
+async def _to_ndjson(results: AsyncIterator[Dict[str, Any]]):
+    """NDJSON: un objeto JSON por línea, para que el cliente procese cada resultado al llegar."""
+    async for result in results:
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+@router.post("/batch")
+async def handle_batch_query(
+    request: schemas.BatchQueryRequest,
+    current_user: models.User = Depends(auth_service.get_current_user)
+):
+    """
+    Responde una lista de preguntas en una sola petición.
+    Los resultados se devuelven como NDJSON en streaming, a medida que se completan
+    (cada línea incluye el 'index' de la pregunta original).
+    """
+    questions = _validate_batch(request)
+    # La recuperación va antes de responder: si falla (p. ej. 503 sin vector store), el cliente
+    # recibe el error con su código HTTP y no un stream 200 cortado a la mitad.
+    docs_per_question = await rag_service.retrieve_batch(questions)
+    return StreamingResponse(
+        _to_ndjson(rag_service.stream_batch_answers(questions, docs_per_question)),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/batch/jobs", response_model=schemas.BatchJobInfo, status_code=status.HTTP_202_ACCEPTED)
+def create_batch_job(
+    request: schemas.BatchQueryRequest,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(auth_service.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Variante asíncrona del lote: registra el trabajo y lo procesa en segundo plano.
+    Consultar el progreso en /batch/jobs/{id} y descargar los resultados en /batch/jobs/{id}/results.
+    """
+    questions = _validate_batch(request)
+    job = models.BatchJob(user_id=current_user.id, questions=questions)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    background_tasks.add_task(rag_service.run_batch_job, job.id)
+    return _batch_job_info(job)
+
+def _get_user_batch_job(db: Session, job_id: int, user_id: int) -> models.BatchJob:
+    job = db.query(models.BatchJob).filter(
+        models.BatchJob.id == job_id,
+        models.BatchJob.user_id == user_id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo batch no encontrado")
+    return job
+
+def _batch_job_info(job: models.BatchJob) -> schemas.BatchJobInfo:
+    return schemas.BatchJobInfo(
+        id=job.id,
+        status=job.status,
+        total=len(job.questions),
+        completed_count=job.completed_count or 0,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+@router.get("/batch/jobs/{job_id}", response_model=schemas.BatchJobInfo)
+def get_batch_job(
+    job_id: int,
+    current_user: models.User = Depends(auth_service.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Estado y progreso de un trabajo batch del usuario."""
+    return _batch_job_info(_get_user_batch_job(db, job_id, current_user.id))
+
+@router.get("/batch/jobs/{job_id}/results")
+def get_batch_job_results(
+    job_id: int,
+    current_user: models.User = Depends(auth_service.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Resultados (parciales o completos) de un trabajo batch, como NDJSON ordenado por 'index'."""
+    job = _get_user_batch_job(db, job_id, current_user.id)
+    rows: Iterable[models.BatchJobResult] = db.query(models.BatchJobResult).filter(
+        models.BatchJobResult.job_id == job.id
+    ).order_by(models.BatchJobResult.index).all()
+    return StreamingResponse(
+        (json.dumps(row.result, ensure_ascii=False) + "\n" for row in rows),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("/history", response_model=List[schemas.ChatHistory])
 def get_user_chat_history(
     current_user: models.User = Depends(auth_service.get_current_user),
@@ -70,6 +179,7 @@ def get_user_chat_history(
 # ### CAMBIO IMPORTANTE: Agregamos 'async'
 @router.post("/upload-context", status_code=status.HTTP_201_CREATED)
 async def upload_context_documents(
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     admin_user: models.User = Depends(auth_service.get_current_admin_user),
     db: Session = Depends(database.get_db)
@@ -83,7 +193,13 @@ async def upload_context_documents(
         
     try:
         # ### CAMBIO CRÍTICO: Usamos 'await' porque el procesamiento de PDFs ahora es async
-        processed = await rag_service.process_and_store_pdfs(files, db, admin_user.id)
+        # Los resúmenes por documento se construyen después de responder (pueden tardar minutos).
+        def schedule_summaries(document_id: int, filename: str, pages):
+            background_tasks.add_task(summary_service.build_document_summaries, document_id, filename, pages)
+
+        processed = await rag_service.process_and_store_pdfs(
+            files, db, admin_user.id, on_document_stored=schedule_summaries
+        )
         
         return {
             "message": f"Archivos procesados y añadidos al contexto: {', '.join(processed)}",
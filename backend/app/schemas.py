@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional, Dict, Any
-from .models import UserRole, SenderType
+from .models import UserRole, SenderType, BatchJobStatus
 import datetime
 
 # --- Token (JWT) ---
@@ -78,6 +78,39 @@ class ChatResponse(BaseModel):
     sources: List[Dict[str, Any]]
     history_id: int
 
+# --- Consultas en lote ---
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+
+class BatchJobInfo(BaseModel):
+    id: int
+    status: BatchJobStatus
+    total: int
+    completed_count: int
+    error: Optional[str] = None
+    created_at: datetime.datetime
+    finished_at: Optional[datetime.datetime] = None
+
+# --- Documentos y corpus ---
+class DocumentInfo(BaseModel):
+    id: int
+    filename: str
+    upload_date: datetime.datetime
+    admin_id: Optional[int] = None
+    retired_at: Optional[datetime.datetime] = None
+    class Config:
+        from_attributes = True
+
+class DocumentRemoval(BaseModel):
+    document_id: int
+    removed_chunks: int
+    corpus_version: int
+
+class CorpusStatus(BaseModel):
+    version: int
+    store_location: str
+    last_compaction: Optional[Dict[str, Any]] = None
+
 # --- Admin ---
 class DemographicStat(BaseModel):
     group: str
@@ -86,3 +119,18 @@ class DemographicStat(BaseModel):
 class UsageStat(BaseModel):
     date: str
     count: int
+
+class RoutingStat(BaseModel):
+    route: str
+    model: str
+    count: int
+    avg_latency_ms: float
+
+class SummaryStats(BaseModel):
+    documents: int
+    pages: int
+    build_seconds: float
+    avg_build_seconds_per_page: Optional[float] = None
+    summary_queries: int
+    avg_summary_latency_ms: Optional[float] = None
+    avg_analytical_latency_ms: Optional[float] = None
@@ -0,0 +1,203 @@
+import datetime
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import chromadb
+import numpy as np
+
+from .. import config
+from ..database import SessionLocal
+from . import corpus_service, rag_service
+from .quantized_store import QuantizedVectorStore
+
+settings = config.settings
+
+# --- Compactación del índice vectorial ---
+# Borrar fragmentos no achica persistent_chroma_db (ni el índice cuantizado): el espacio queda
+# ocupado y el índice ANN conserva los nodos borrados. La compactación reconstruye el índice
+# en una ubicación NUEVA copiando solo los fragmentos vivos, y al terminar cambia la ubicación
+# activa en corpus_state (swap atómico). Mientras tanto las búsquedas siguen contra el índice
+# viejo sin bloquearse; solo las ingestas esperan, porque la copia se hace bajo el lock de ingesta.
+# La ubicación vieja se borra, incluida la configurada (CHROMA_PATH / QUANTIZED_INDEX_PATH) en la
+# primera compactación: desde entonces la única referencia al índice es corpus_state, y si esa fila
+# falta los workers se niegan a abrir una ubicación inexistente (ver rag_service._check_store_location).
+
+_COPY_BATCH = 5000
+_LATENCY_SAMPLES = 50
+_CALIBRATION_ROWS = 20000  # Muestra mínima para la escala del cuantizador del índice nuevo.
+
+def compact_vector_store() -> Dict[str, Any]:
+    """
+    Reconstruye el vector store sin los fragmentos borrados y lo activa en todos los workers.
+    Devuelve (y guarda en corpus_state) un informe con tamaño en disco y latencia antes/después.
+    """
+    db = SessionLocal()
+    try:
+        with corpus_service.ingestion_lock():
+            # Partimos de la versión más reciente del corpus, no de una copia desactualizada en memoria.
+            rag_service.invalidate_caches()
+            old_vs = rag_service.get_vector_store()
+            if not old_vs:
+                raise RuntimeError("El sistema vectorial no está disponible.")
+            old_location = corpus_service.get_store_location(db)
+
+            queries = _sample_vectors(old_vs)
+            before = {"disk_bytes": _disk_size(old_location), **_search_latency(queries)}
+
+            new_location = _new_location()
+            started = time.monotonic()
+            copied = _rebuild(old_vs, new_location)
+            # Los resúmenes por documento viven en un store hermano: se mueven junto con el principal.
+            summary_vs = rag_service.get_summary_store()
+            copied_summaries = _rebuild(summary_vs, new_location, summaries=True) if summary_vs else 0
+            build_s = round(time.monotonic() - started, 2)
+
+            # SWAP: desde este commit, los workers que vean la nueva versión abren la nueva ubicación.
+            corpus_service.set_state(db, corpus_service.STORE_LOCATION_KEY, new_location)
+            version = corpus_service.bump_corpus_version(db)
+            db.commit()
+
+        rag_service.invalidate_caches()
+        after = {"disk_bytes": _disk_size(new_location), **_search_latency(queries)}
+
+        report = {
+            "finished_at": datetime.datetime.utcnow().isoformat(),
+            "corpus_version": version,
+            "old_location": old_location,
+            "new_location": new_location,
+            "chunks": copied,
+            "summary_chunks": copied_summaries,
+            "build_s": build_s,
+            "before": before,
+            "after": after,
+        }
+        corpus_service.set_state(db, corpus_service.LAST_COMPACTION_KEY, json.dumps(report))
+        db.commit()
+    finally:
+        db.close()
+
+    # Damos tiempo a que los demás workers detecten la nueva versión antes de borrar la ubicación vieja.
+    time.sleep(settings.CORPUS_VERSION_POLL_SECONDS * 2 + 1)
+    _drop_location(old_location)
+    print(f"Compactación finalizada: {report['before']} -> {report['after']}")
+    return report
+
+def run_compaction_job():
+    """Envoltorio para BackgroundTasks: registra el error en lugar de perderlo en silencio."""
+    try:
+        compact_vector_store()
+    except Exception as e:
+        print(f"Error compactando el vector store: {e}")
+
+def _new_location() -> str:
+    """Ubicación nueva derivada de la configurada: carpeta hermana o colección con sufijo."""
+    stamp = datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    base = corpus_service.default_store_location().rstrip("/\\")
+    if settings.VECTOR_STORE_BACKEND == "chroma" and settings.CHROMA_SERVER_HOST:
+        return f"{base}_{stamp}"
+    return f"{base}-{stamp}"
+
+def _chroma_client(location: str):
+    if settings.CHROMA_SERVER_HOST:
+        return chromadb.HttpClient(host=settings.CHROMA_SERVER_HOST, port=settings.CHROMA_SERVER_PORT)
+    return chromadb.PersistentClient(path=location)
+
+def _rebuild(old_vs, new_location: str, summaries: bool = False) -> int:
+    """
+    Copia los fragmentos vivos (con sus embeddings, sin recalcularlos) a la nueva ubicación.
+    summaries=True copia al store hermano de resúmenes de esa ubicación.
+    """
+    copied = 0
+    if isinstance(old_vs, QuantizedVectorStore):
+        new_vs = QuantizedVectorStore(
+            path=corpus_service.summary_location(new_location) if summaries else new_location,
+            embedding_function=old_vs.embeddings,
+            rescore_factor=settings.QUANTIZED_RESCORE_FACTOR,
+            nprobe=settings.QUANTIZED_IVF_NPROBE,
+            ivf_lists=settings.QUANTIZED_IVF_LISTS,
+            ivf_min_rows=settings.QUANTIZED_IVF_MIN_ROWS
+        )
+        # Escala del cuantizador y centroides salen de una muestra del corpus completo (no solo de las
+        # primeras filas copiadas): la compactación es también el momento de ajustarlos a su tamaño actual.
+        live = old_vs.count()
+        sample = old_vs.sample_vectors(max(new_vs.ivf_training_rows(live), _CALIBRATION_ROWS))
+        if settings.QUANTIZED_IVF_MIN_ROWS and live >= settings.QUANTIZED_IVF_MIN_ROWS:
+            new_vs.train_ivf(sample, expected_rows=live)  # También fija la escala con la muestra.
+        else:
+            new_vs.calibrate(sample)
+        for ids, texts, metadatas, vectors in old_vs.iter_live_records(_COPY_BATCH):
+            new_vs.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+            copied += len(ids)
+        return copied
+
+    old_collection = old_vs._collection
+    client = _chroma_client(new_location)
+    # En modo servidor la ubicación es el nombre de la colección; en local, la carpeta.
+    if settings.CHROMA_SERVER_HOST:
+        name = corpus_service.summary_location(new_location) if summaries else new_location
+    else:
+        name = old_collection.name
+    new_collection = client.create_collection(name=name, metadata=old_collection.metadata)
+    total = old_collection.count()
+    for offset in range(0, total, _COPY_BATCH):
+        page = old_collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=_COPY_BATCH, offset=offset
+        )
+        if not page["ids"]:
+            break
+        new_collection.add(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        copied += len(page["ids"])
+    return copied
+
+def _drop_location(location: str):
+    try:
+        if settings.VECTOR_STORE_BACKEND == "chroma" and settings.CHROMA_SERVER_HOST:
+            client = _chroma_client(location)
+            client.delete_collection(location)
+            summaries = corpus_service.summary_location(location)
+            if summaries in [c if isinstance(c, str) else c.name for c in client.list_collections()]:
+                client.delete_collection(summaries)
+        else:
+            shutil.rmtree(location, ignore_errors=True)
+    except Exception as e:
+        print(f"No se pudo eliminar la ubicación anterior {location}: {e}")
+
+def _disk_size(location: str) -> Optional[int]:
+    """Bytes en disco de una ubicación local (None en modo servidor: el disco es del servidor Chroma)."""
+    path = Path(location)
+    if not path.is_dir():
+        return None
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def _sample_vectors(vs) -> List[List[float]]:
+    if isinstance(vs, QuantizedVectorStore):
+        return vs.sample_vectors(_LATENCY_SAMPLES).tolist()
+    count = vs._collection.count()
+    offset = int(np.random.default_rng(0).integers(0, max(count - _LATENCY_SAMPLES, 0) + 1))
+    page = vs._collection.get(include=["embeddings"], limit=_LATENCY_SAMPLES, offset=offset)
+    return [list(map(float, vector)) for vector in page["embeddings"]]
+
+def _search_latency(queries: List[List[float]], k: int = 5) -> Dict[str, Optional[float]]:
+    """Latencia p50/p99 (ms) del vector store activo, con búsquedas individuales de vectores del corpus."""
+    if not queries:
+        return {"p50_ms": None, "p99_ms": None}
+    # Búsqueda de calentamiento sin medir: tras el swap, la primera incluye reabrir el store nuevo
+    # y consultar la versión del corpus, y sesgaría p50/p99 con pocas muestras.
+    rag_service.search_by_vectors([queries[0]], k)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        rag_service.search_by_vectors([query], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
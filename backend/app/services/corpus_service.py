@@ -0,0 +1,101 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from filelock import FileLock # Lock entre procesos basado en archivo (funciona en Linux y Windows).
+from sqlalchemy.orm import Session
+
+from .. import models, config
+
+settings = config.settings
+
+# --- Estado compartido del corpus entre workers ---
+# Con varios workers de uvicorn cada proceso tiene sus propias instancias en memoria.
+# Para coordinarlos usamos dos piezas que sí son compartidas:
+#   1. Un lock de archivo junto a CHROMA_PATH: garantiza un único escritor durante la ingesta.
+#   2. Una "versión del corpus" en la base SQL: cada escritura la incrementa y los demás
+#      workers, al ver un número nuevo, invalidan sus caches (ver rag_service).
+
+CORPUS_VERSION_KEY = "version"
+# Ubicación activa del vector store (carpeta, o colección en modo servidor). La compactación
+# construye una copia nueva y cambia este valor para que todos los workers pasen a usarla.
+STORE_LOCATION_KEY = "store_location"
+LAST_COMPACTION_KEY = "last_compaction"
+
+# El FileLock excluye a los demás procesos; dentro de un mismo worker los escritores (subidas,
+# borrados, compactación, resúmenes) corren en hilos distintos y el FileLock es reentrante,
+# así que además los serializamos con un lock de hilos.
+_ingestion_file_lock = FileLock(settings.CHROMA_PATH.rstrip("/\\") + ".lock")
+_ingestion_thread_lock = threading.Lock()
+
+@contextmanager
+def ingestion_lock(timeout: float = -1):
+    """
+    Garantiza que un solo escritor (entre procesos y entre hilos) use el vector store a la vez.
+    Es bloqueante: usar desde un hilo (asyncio.to_thread), nunca directamente en el event loop.
+    """
+    if not _ingestion_thread_lock.acquire(timeout=timeout):
+        raise TimeoutError("No se pudo obtener el lock de ingesta.")
+    try:
+        with _ingestion_file_lock.acquire(timeout=timeout):
+            yield
+    finally:
+        _ingestion_thread_lock.release()
+
+def get_state(db: Session, key: str) -> Optional[str]:
+    row = db.query(models.CorpusState).filter(models.CorpusState.key == key).first()
+    return row.value if row else None
+
+def set_state(db: Session, key: str, value: str):
+    """Guarda un valor en la tabla clave/valor. No hace commit: lo decide quien llama."""
+    row = db.query(models.CorpusState).filter(models.CorpusState.key == key).first()
+    if row:
+        row.value = value
+    else:
+        db.add(models.CorpusState(key=key, value=value))
+
+def get_corpus_version(db: Session) -> int:
+    """Versión actual del corpus vectorial (0 si nunca se modificó)."""
+    value = get_state(db, CORPUS_VERSION_KEY)
+    return int(value) if value else 0
+
+def bump_corpus_version(db: Session) -> int:
+    """
+    Incrementa la versión del corpus. Debe llamarse dentro de ingestion_lock(),
+    que es lo que serializa los incrementos entre procesos. No hace commit.
+    """
+    version = get_corpus_version(db) + 1
+    set_state(db, CORPUS_VERSION_KEY, str(version))
+    return version
+
+def default_store_location() -> str:
+    if settings.VECTOR_STORE_BACKEND == "quantized":
+        return settings.QUANTIZED_INDEX_PATH
+    if settings.CHROMA_SERVER_HOST:
+        return settings.CHROMA_COLLECTION
+    return settings.CHROMA_PATH
+
+def summary_location(location: str) -> str:
+    """
+    Ubicación hermana donde viven los resúmenes por documento: subcarpeta del índice cuantizado
+    o colección con sufijo en Chroma. Se deriva de la principal, así que la compactación las mueve juntas.
+    """
+    if settings.VECTOR_STORE_BACKEND == "quantized":
+        return os.path.join(location, "summaries")
+    return f"{location}_summaries"
+
+def get_store_location(db: Session) -> str:
+    """Carpeta (o colección) que deben abrir los workers; la configurada si nunca se compactó."""
+    return get_state(db, STORE_LOCATION_KEY) or default_store_location()
+
+def store_must_exist(db: Session) -> bool:
+    """
+    True si el vector store ya debería tener datos: hubo una compactación (la ubicación activa está
+    en corpus_state) o hay documentos cargados. La primera compactación borra la ubicación configurada
+    (CHROMA_PATH o QUANTIZED_INDEX_PATH), así que si la fila de corpus_state se pierde, abrirla crearía
+    un índice vacío en silencio: rag_service se niega a abrir una ubicación inexistente en ese caso.
+    """
+    if get_state(db, STORE_LOCATION_KEY):
+        return True
+    return db.query(models.Document.id).first() is not None
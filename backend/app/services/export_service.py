@@ -0,0 +1,102 @@
+import datetime
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# --- Exportación de historiales para auditoría ---
+# Recorre la tabla de mensajes con un cursor del lado del servidor (stream_results + yield_per):
+# SQLAlchemy trae las filas de a 'chunk_size' y nunca arma objetos ORM, así que la memoria
+# se mantiene constante sin importar el tamaño de la tabla.
+# El orden es siempre por Message.id, lo que permite reanudar una exportación con 'after_id'.
+
+EXPORT_COLUMNS = [
+    "id", "history_id", "user_id", "history_created_at",
+    "sender", "content", "sources", "timestamp"
+]
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, models.SenderType):
+        return value.value
+    return value
+
+def iter_message_rows(
+    db: Session,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    after_id: Optional[int] = None,
+    chunk_size: int = 1000
+) -> Iterator[Dict[str, Any]]:
+    """
+    Mensajes (con los datos de su historial) como diccionarios planos, en orden de id.
+    start/end filtran por Message.timestamp (end exclusivo); after_id reanuda tras ese id.
+    """
+    query = db.query(
+        models.Message.id,
+        models.Message.history_id,
+        models.ChatHistory.user_id,
+        models.ChatHistory.created_at.label("history_created_at"),
+        models.Message.sender,
+        models.Message.content,
+        models.Message.sources,
+        models.Message.timestamp
+    ).join(
+        models.ChatHistory, models.ChatHistory.id == models.Message.history_id
+    )
+
+    if start:
+        query = query.filter(models.Message.timestamp >= start)
+    if end:
+        query = query.filter(models.Message.timestamp < end)
+    if after_id:
+        query = query.filter(models.Message.id > after_id)
+
+    query = query.order_by(models.Message.id).execution_options(stream_results=True).yield_per(chunk_size)
+
+    for row in query:
+        yield {column: _serialize(value) for column, value in zip(EXPORT_COLUMNS, row)}
+
+def iter_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """Una línea JSON por mensaje."""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+def iter_columnar(rows: Iterator[Dict[str, Any]], chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Bloques columnares (al estilo de los row groups de Parquet): una línea JSON por cada
+    'chunk_size' mensajes, con una lista por columna y el 'last_id' para reanudar.
+    """
+    columns: Dict[str, List[Any]] = {column: [] for column in EXPORT_COLUMNS}
+    count = 0
+    for row in rows:
+        for column in EXPORT_COLUMNS:
+            columns[column].append(row[column])
+        count += 1
+        if count == chunk_size:
+            yield _columnar_chunk(columns, count)
+            columns = {column: [] for column in EXPORT_COLUMNS}
+            count = 0
+    if count:
+        yield _columnar_chunk(columns, count)
+
+def _columnar_chunk(columns: Dict[str, List[Any]], count: int) -> str:
+    chunk = {"rows": count, "last_id": columns["id"][-1], "columns": columns}
+    return json.dumps(chunk, ensure_ascii=False) + "\n"
+
+def iter_export(
+    db: Session,
+    format: str = "ndjson",
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    after_id: Optional[int] = None,
+    chunk_size: int = 1000
+) -> Iterator[str]:
+    """Punto de entrada común para el endpoint de administración y el CLI."""
+    rows = iter_message_rows(db, start=start, end=end, after_id=after_id, chunk_size=chunk_size)
+    if format == "columnar":
+        return iter_columnar(rows, chunk_size)
+    return iter_ndjson(rows)
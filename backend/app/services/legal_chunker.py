@@ -0,0 +1,161 @@
+import re
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# --- Chunker para textos legislativos argentinos ---
+# En lugar de cortar cada N caracteres, corta en los límites lógicos del texto:
+#   TÍTULO -> CAPÍTULO -> ARTÍCULO -> incisos (a), b), 1), 2)...)
+# Cada artículo queda en un único fragmento; solo si supera max_chars se divide por incisos
+# y, en último caso, por caracteres con un solapamiento mínimo.
+# Cada fragmento lleva como metadata el número de artículo, capítulo y título, lo que permite
+# responder "¿qué dice el artículo 14?" con una búsqueda exacta en lugar de una vectorial.
+
+# "ARTÍCULO 1°.-", "ARTICULO 1° — Objeto", "Artículo 14 bis.-", "ARTICULO 5 bis —", "ART. 5º -".
+# Para no confundir encabezados con citas en el texto que caen a principio de renglón
+# ("...previsto en el\nartículo 5. Los sujetos..."), se exige la forma de encabezado:
+#   - la palabra en mayúsculas o capitalizada (no "artículo"),
+#   - y un separador final: cualquiera (.-–—:) tras un ordinal (°, º, o); sin ordinal, un guion o dos puntos.
+ARTICLE_RE = re.compile(
+    r"^[ \t]*(?:ART[ÍI]CULO|Art[íi]culo|ART\.|Art\.)[ \t]*(?P<num>\d+)[ \t]*"
+    r"(?P<ordinal>[°º]|o(?=[ \t]*[.\-–—:]))?[ \t]*(?P<suffix>(?i:bis|ter|quater))?[ \t]*"
+    r"(?(ordinal)[.\-–—:]|\.?[ \t]*[\-–—:])",
+    re.MULTILINE
+)
+# "CAPITULO I", "CAPÍTULO II - Del acceso", "Capítulo Único — ...", "TITULO PRELIMINAR", "TÍTULO III.".
+# Misma regla que para los artículos: palabra en mayúsculas o capitalizada, y el encabezado solo en su
+# renglón o seguido de un separador, para no cortar en citas como "...en el\ncapítulo III de la Ley".
+CHAPTER_RE = re.compile(
+    r"^[ \t]*(?:CAP[ÍI]TULO|Cap[íi]tulo)[ \t]+(?P<num>[IVXLCDM]+|\d+[°º]?|[ÚU]NICO|[ÚU]nico)"
+    r"[ \t]*(?:$|[.\-–—:])",
+    re.MULTILINE
+)
+TITLE_RE = re.compile(
+    r"^[ \t]*(?:T[ÍI]TULO|T[íi]tulo)[ \t]+(?P<num>[IVXLCDM]+|\d+[°º]?|PRELIMINAR|Preliminar|[ÚU]NICO|[ÚU]nico)"
+    r"[ \t]*(?:$|[.\-–—:])",
+    re.MULTILINE
+)
+# Incisos al inicio de línea: "a) ...", "ñ) ...", "1) ...".
+INCISO_RE = re.compile(r"^[ \t]*(?:[a-zñ]|\d{1,2})\)\s", re.MULTILINE)
+
+def article_number(match: "re.Match[str]") -> str:
+    """Número de artículo normalizado: "14", "14 bis"."""
+    suffix = match.group("suffix")
+    return f"{match.group('num')} {suffix.lower()}" if suffix else match.group("num")
+
+class LegalTextSplitter:
+    """
+    Divide los documentos de un PDF (una página por Document, como los entrega PyPDFLoader)
+    en un fragmento por unidad lógica. Los artículos que cruzan páginas se unen.
+    """
+
+    def __init__(self, max_chars: int = 1500, overlap: int = 50):
+        self.max_chars = max_chars
+        # Respaldo para artículos sin incisos o textos sin estructura (p. ej. versiones taquigráficas).
+        self._fallback = RecursiveCharacterTextSplitter(chunk_size=max_chars, chunk_overlap=overlap)
+
+    def split_documents(self, docs: List[Document]) -> List[Document]:
+        # Agrupamos por archivo de origen manteniendo el orden de páginas.
+        by_source: Dict[Any, List[Document]] = {}
+        for doc in docs:
+            by_source.setdefault(doc.metadata.get("source"), []).append(doc)
+
+        chunks = []
+        for pages in by_source.values():
+            chunks.extend(self._split_source(pages))
+        return chunks
+
+    def _split_source(self, pages: List[Document]) -> List[Document]:
+        # Texto continuo del documento + offset donde empieza cada página (para asignar 'page').
+        page_starts, parts, offset = [], [], 0
+        for page in pages:
+            page_starts.append(offset)
+            parts.append(page.page_content)
+            offset += len(page.page_content) + 1
+        text = "\n".join(parts)
+        base_metadata = {k: v for k, v in pages[0].metadata.items() if k not in ("page", "page_label")}
+
+        chunks = []
+        for start, end, structure in self._segments(text):
+            for piece_start, piece in self._split_segment(text, start, end):
+                metadata = dict(base_metadata)
+                page_index = bisect_right(page_starts, piece_start) - 1
+                metadata["page"] = pages[page_index].metadata.get("page", page_index)
+                metadata["start_index"] = piece_start
+                metadata.update(structure)
+                chunks.append(Document(page_content=piece, metadata=metadata))
+        return chunks
+
+    def _segments(self, text: str) -> List[Tuple[int, int, Dict[str, str]]]:
+        """
+        Límites (inicio, fin, estructura) de cada unidad lógica.
+        Los encabezados de TÍTULO/CAPÍTULO no forman un fragmento propio: se anexan al artículo siguiente.
+        """
+        headings = sorted(
+            [(m.start(), "titulo", m.group("num").upper()) for m in TITLE_RE.finditer(text)]
+            + [(m.start(), "capitulo", m.group("num").upper()) for m in CHAPTER_RE.finditer(text)]
+            + [(m.start(), "articulo", article_number(m)) for m in ARTICLE_RE.finditer(text)]
+        )
+
+        segments = []
+        structure: Dict[str, str] = {}
+        segment_start = 0
+        segment_structure: Dict[str, str] = {}
+        headings_only = False # True si el segmento abierto solo tiene encabezados de título/capítulo.
+        for position, kind, number in headings:
+            if not headings_only:
+                # Cerramos el segmento anterior (preámbulo o artículo) antes de este encabezado.
+                if text[segment_start:position].strip():
+                    segments.append((segment_start, position, segment_structure))
+                segment_start = position
+            headings_only = kind != "articulo"
+
+            if kind == "titulo":
+                structure = {"titulo": number}
+            elif kind == "capitulo":
+                structure = {k: v for k, v in structure.items() if k == "titulo"}
+                structure["capitulo"] = number
+            else:
+                structure = {k: v for k, v in structure.items() if k != "articulo"}
+                structure["articulo"] = number
+            segment_structure = dict(structure)
+
+        if text[segment_start:].strip():
+            segments.append((segment_start, len(text), segment_structure))
+        return segments
+
+    def _split_segment(self, text: str, start: int, end: int) -> List[Tuple[int, str]]:
+        """Un solo fragmento si entra en max_chars; si no, se agrupan incisos y luego caracteres."""
+        raw = text[start:end]
+        segment = raw.strip()
+        start += len(raw) - len(raw.lstrip())
+        if len(segment) <= self.max_chars:
+            return [(start, segment)] if segment else []
+
+        # Cortes en cada inciso, empaquetando incisos consecutivos mientras entren en max_chars.
+        cuts = [0] + [m.start() for m in INCISO_RE.finditer(segment) if m.start() > 0] + [len(segment)]
+        pieces: List[Tuple[int, str]] = []
+        piece_start: Optional[int] = None
+        for cut_start, cut_end in zip(cuts, cuts[1:]):
+            if piece_start is not None and cut_end - piece_start > self.max_chars:
+                pieces.append((piece_start, segment[piece_start:cut_start]))
+                piece_start = None
+            if piece_start is None:
+                piece_start = cut_start
+        pieces.append((piece_start, segment[piece_start:]))
+
+        # Las piezas que aún excedan (incisos enormes o texto sin estructura) van al splitter de respaldo.
+        result = []
+        for offset, piece in pieces:
+            if len(piece) <= self.max_chars:
+                result.append((start + offset, piece.strip()))
+                continue
+            search_from = 0
+            for sub in self._fallback.split_text(piece):
+                position = piece.find(sub, search_from)
+                position = position if position >= 0 else search_from
+                search_from = position + 1
+                result.append((start + offset + position, sub))
+        return [(position, piece) for position, piece in result if piece]
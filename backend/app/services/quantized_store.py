@@ -0,0 +1,722 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# --- Índice vectorial compacto (int8 + re-scoring exacto) ---
+# Alternativa a Chroma para corpus muy grandes. Cada vector se guarda dos veces en disco:
+#   - codes.i8:    versión cuantizada a int8 (4x más chica), que es la que se recorre en cada búsqueda.
+#   - vectors.f32: versión exacta en float32, que solo se lee para las pocas filas candidatas.
+# Ambos archivos se abren con np.memmap: el sistema operativo decide qué páginas quedan en RAM,
+# así que la memoria residente la domina el archivo int8 y no los vectores completos.
+#
+# Índice grueso IVF (inverted file): a partir de ivf_min_rows filas se entrenan centroides con
+# k-means (centroids.npy) y cada fila queda asignada a su centroide más cercano (lists.u32).
+# Una búsqueda solo recorre las filas de los nprobe listas más cercanas a la consulta, así que el
+# costo deja de crecer linealmente con el corpus. Las altas posteriores se asignan al vuelo.
+#
+# Búsqueda en dos fases:
+#   1. Códigos int8 de las listas sondeadas (o de todo el índice si no hay IVF)
+#      -> top (k * rescore_factor) candidatos aproximados.
+#   2. Producto escalar exacto en float32 sobre esos candidatos -> top k definitivo.
+#
+# Filtros de metadata: los valores de _FILTER_KEYS se guardan al dar de alta cada fila en metadata.sqlite
+# (clave, valor, fila), así que un filtro es una consulta por índice y no una lectura de records.jsonl.
+# La tabla también solo crece: las bajas se resuelven con los tombstones, no reescribiéndola.
+#
+# Escala del cuantizador: por dimensión, a partir del máximo absoluto de los vectores. La primera alta
+# suele ser un PDF chico, así que esa escala es provisoria: mientras el índice es chico se recalcula con
+# todas las filas cada vez que un alta recorta valores, y al entrenar el IVF o compactar se recalcula con
+# una muestra del corpus completo. Recalibrar reescribe los códigos en un archivo nuevo (codes.<n>.i8 y
+# scale.<n>.npy) y los activa reemplazando manifest.json, así que un lector nunca combina escala y códigos
+# de distinta generación.
+#
+# Los archivos solo crecen por el final (append), así que las altas incrementales no reescriben nada
+# y otros procesos ven las filas nuevas con solo mirar el tamaño del archivo.
+# Las bajas marcan la fila en deleted.u8 (tombstone); el espacio se recupera al compactar,
+# reescribiendo solo las filas vivas en un índice nuevo (ver compaction_service).
+
+_BLOCK_ROWS = 16384  # Filas int8 que se convierten a float32 por iteración (acota la memoria temporal).
+# Filas int8 que se convierten a float32 y se puntúan por vez: el buffer (~768 KB a 768 dims) entra en caché,
+# así que la conversión no sale a memoria principal (convertir bloques grandes dominaba el costo).
+_SCORE_ROWS = 256
+_TRAIN_ROWS_PER_LIST = 32  # Muestra de entrenamiento de k-means por centroide.
+_KMEANS_ITERATIONS = 8
+# Con un filtro de metadata, si quedan pocas filas se puntúan todas en float32 (resultado exacto);
+# si quedan muchas, el filtro se aplica como máscara sobre la búsqueda aproximada.
+_EXACT_FILTER_ROWS = 20000
+# Claves de metadata por las que se puede filtrar (las que usan rag_service y la compactación).
+# Un alta que recorta más de esta fracción de sus valores dispara la recalibración, mientras el índice
+# tenga hasta _RECALIBRATE_MAX_ROWS filas (reescribir los códigos de un índice chico es barato).
+_RECALIBRATE_CLIPPED = 1e-4
+_RECALIBRATE_MAX_ROWS = 50000
+_FILTER_KEYS = ("document_id", "filename", "articulo", "summary_level")
+_METADATA_BATCH = 10000  # Filas de records.jsonl por lote al indexar un índice anterior a metadata.sqlite.
+
+class _State(NamedTuple):
+    """
+    Foto inmutable de los archivos del índice. _refresh arma una nueva y la publica con una sola
+    asignación; cada lectura toma la foto al empezar y trabaja solo con ella, así que una búsqueda
+    concurrente con un alta nunca mezcla el memmap viejo con el rango de filas (o las listas) nuevo.
+    """
+    generation: int = 0  # Generación de la escala (ver calibrate): codes y scale siempre son de la misma.
+    scale: Optional[np.ndarray] = None
+    count: int = 0
+    codes: Optional[np.ndarray] = None
+    vectors: Optional[np.ndarray] = None
+    offsets: Optional[np.ndarray] = None
+    deleted: Optional[np.ndarray] = None  # Filas dadas de baja (tombstones).
+    # IVF: centroides, y filas agrupadas por lista (list_rows[list_bounds[c]:list_bounds[c + 1]]).
+    centroids: Optional[np.ndarray] = None
+    list_rows: Optional[np.ndarray] = None
+    list_bounds: Optional[np.ndarray] = None
+    listed: int = 0  # Filas con lista asignada (las siguientes, si las hay, se recorren completas).
+
+    def is_deleted(self, rows: np.ndarray) -> np.ndarray:
+        if self.deleted is None:
+            return np.zeros(len(rows), dtype=bool)
+        inside = rows < len(self.deleted)
+        result = np.zeros(len(rows), dtype=bool)
+        result[inside] = self.deleted[rows[inside]]
+        return result
+
+class QuantizedVectorStore(VectorStore):
+    """
+    Vector store local con vectores int8 en archivos memory-mapped y re-scoring exacto.
+    Usa similitud coseno (los vectores se normalizan al guardarlos).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding_function: Embeddings,
+        rescore_factor: int = 10,
+        nprobe: int = 64,
+        ivf_lists: int = 0,
+        ivf_min_rows: int = 50000,
+    ):
+        """
+        nprobe: listas IVF que se recorren por consulta (0 = recorrer todo el índice).
+        ivf_lists: cantidad de centroides (0 = automático, ~sqrt(filas) al entrenar).
+        ivf_min_rows: filas a partir de las cuales se entrena el IVF (0 = nunca).
+        """
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._embedding = embedding_function
+        self._rescore_factor = max(rescore_factor, 1)
+        self._nprobe = nprobe
+        self._ivf_lists = ivf_lists
+        self._ivf_min_rows = ivf_min_rows
+        self._lock = threading.RLock()
+
+        self._dim: Optional[int] = None
+        self._state = _State()
+        self._stamps: Optional[tuple] = None  # Con qué archivos se armó self._state (ver _refresh).
+        self._metadata_db: Optional[sqlite3.Connection] = None
+        self._refresh()
+
+    # --- Archivos ---
+
+    def _file(self, name: str) -> Path:
+        return self._path / name
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _refresh(self) -> _State:
+        """
+        Devuelve la foto actual del índice, rearmándola si otro proceso (o este) agregó o dio de baja
+        filas, entrenó el IVF o recalibró la escala. El número de filas se deduce del tamaño del archivo
+        de códigos, el último en escribirse.
+        """
+        with self._lock:
+            try:
+                return self._reload()
+            except FileNotFoundError:
+                # Otro proceso recalibró entre que leímos manifest.json y abrimos los códigos viejos.
+                self._stamps = None
+                return self._reload()
+
+    def _reload(self) -> _State:
+        manifest_stamp = _stamp(self._file("manifest.json"))
+        if manifest_stamp is None:
+            return self._state
+        old, old_stamps = self._state, self._stamps or (None, None, None, None)
+        if manifest_stamp != old_stamps[0]:
+            manifest = json.loads(self._file("manifest.json").read_text())
+            self._dim = manifest["dim"]
+            generation = manifest.get("generation", 0)
+            scale = np.load(self._file(_scale_name(generation)))
+        else:
+            generation, scale = old.generation, old.scale
+
+        codes_file = self._file(_codes_name(generation))
+        count = os.path.getsize(codes_file) // self._dim if codes_file.exists() else 0
+        deleted_stamp = _stamp(self._file("deleted.u8"))
+        centroids_stamp = _stamp(self._file("centroids.npy"))
+        stamps = (manifest_stamp, count, deleted_stamp, centroids_stamp)
+        if stamps == self._stamps:
+            return self._state
+
+        rows_changed = count != old_stamps[1] or manifest_stamp != old_stamps[0]
+        if rows_changed and count:
+            codes = np.memmap(codes_file, dtype=np.int8, mode="r", shape=(count, self._dim))
+            vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(count, self._dim))
+            offsets = np.memmap(self._file("offsets.u64"), dtype=np.uint64, mode="r", shape=(count,))
+        elif rows_changed:
+            codes = vectors = offsets = None
+        else:
+            codes, vectors, offsets = old.codes, old.vectors, old.offsets
+
+        deleted = old.deleted
+        if deleted_stamp != old_stamps[2]:
+            deleted = np.fromfile(self._file("deleted.u8"), dtype=np.uint8).astype(bool) if deleted_stamp else None
+
+        centroids = old.centroids
+        if centroids_stamp != old_stamps[3]:
+            centroids = np.load(self._file("centroids.npy")) if centroids_stamp else None
+        if count != old_stamps[1] or centroids_stamp != old_stamps[3]:
+            list_rows, list_bounds, listed = self._read_lists(centroids, count)
+        else:
+            list_rows, list_bounds, listed = old.list_rows, old.list_bounds, old.listed
+
+        self._state = _State(
+            generation, scale, count, codes, vectors, offsets, deleted, centroids, list_rows, list_bounds, listed
+        )
+        self._stamps = stamps
+        return self._state
+
+    def _read_lists(self, centroids: Optional[np.ndarray], count: int) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], int]:
+        """Agrupa las filas por lista IVF (un argsort de lists.u32: se repite solo cuando hay altas)."""
+        lists_file = self._file("lists.u32")
+        if centroids is None or not lists_file.exists():
+            return None, None, 0
+        # lists.u32 se escribe antes que codes.i8, así que cubre al menos 'count' filas.
+        listed = min(os.path.getsize(lists_file) // 4, count)
+        assignment = np.fromfile(lists_file, dtype=np.uint32, count=listed)
+        list_rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_bounds = np.searchsorted(assignment[list_rows], np.arange(len(centroids) + 1))
+        return list_rows, list_bounds, listed
+
+    def count(self) -> int:
+        """Filas vivas (sin contar las dadas de baja). No es __len__: un índice vacío no debe ser "falsy"."""
+        state = self._refresh()
+        deleted = int(state.deleted[:state.count].sum()) if state.deleted is not None else 0
+        return state.count - deleted
+
+    def disk_usage(self) -> Dict[str, int]:
+        """Bytes en disco por archivo (útil para comparar contra Chroma)."""
+        return {f.name: f.stat().st_size for f in self._path.iterdir() if f.is_file()}
+
+    # --- Escritura ---
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Agrega filas con embeddings ya calculados.
+        La escritura entre procesos debe serializarse desde fuera (ver corpus_service.ingestion_lock).
+        """
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        with self._lock:
+            state = self._refresh()
+            if self._dim is None:
+                self._init_index(vectors)
+                state = self._refresh()
+            codes = _quantize(vectors, state.scale)
+            clipped = float((np.abs(vectors) > state.scale * 127.5).mean())
+
+            # Orden de escritura: registros -> offsets -> metadata -> listas IVF -> float32 -> int8.
+            # codes.i8 define cuántas filas hay, así que un lector nunca ve una fila a medio escribir.
+            with open(self._file("records.jsonl"), "ab") as records:
+                offsets = []
+                for record_id, text, metadata in zip(ids, texts, metadatas):
+                    offsets.append(records.tell())
+                    line = json.dumps({"id": record_id, "text": text, "metadata": metadata}, ensure_ascii=False)
+                    records.write(line.encode("utf-8") + b"\n")
+            with open(self._file("offsets.u64"), "ab") as f:
+                f.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+            self._sync_metadata(state)
+            self._index_metadata(state.count, metadatas)
+            if state.centroids is not None:
+                # Alta incremental en el IVF: cada fila nueva va a la lista de su centroide más cercano.
+                with open(self._file("lists.u32"), "ab") as f:
+                    f.write(_assign(vectors, state.centroids).tobytes())
+            with open(self._file("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._file(_codes_name(state.generation)), "ab") as f:
+                f.write(codes.tobytes())
+
+            state = self._refresh()
+            if state.centroids is None and self._ivf_min_rows and state.count >= self._ivf_min_rows:
+                self.train_ivf()  # También recalibra la escala.
+            elif clipped > _RECALIBRATE_CLIPPED and state.count <= _RECALIBRATE_MAX_ROWS:
+                self.calibrate(np.asarray(state.vectors))
+        return ids
+
+    def _init_index(self, vectors: np.ndarray):
+        """Primer alta: fija la dimensión y una escala inicial del cuantizador (ver calibrate)."""
+        self._dim = vectors.shape[1]
+        np.save(self._file(_scale_name(0)), _fit_scale(vectors))
+        self._write_manifest(0)
+
+    def _write_manifest(self, generation: int):
+        # Escritura atómica: reemplazar manifest.json es lo que activa una generación de escala y códigos.
+        tmp_file = self._file("manifest.json.tmp")
+        tmp_file.write_text(json.dumps({"dim": self._dim, "dtype": "int8", "generation": generation}))
+        os.replace(tmp_file, self._file("manifest.json"))
+
+    def calibrate(self, sample: np.ndarray):
+        """
+        Recalcula la escala del cuantizador con 'sample' (vectores representativos del corpus) y
+        recuantiza todas las filas desde vectors.f32. En un índice vacío solo fija la escala.
+        Como las altas, debe serializarse entre procesos (ver corpus_service.ingestion_lock).
+        """
+        sample = np.asarray(sample, dtype=np.float32)
+        if len(sample) == 0:
+            return
+        with self._lock:
+            state = self._refresh()
+            if self._dim is None:
+                self._init_index(sample)
+                self._refresh()
+                return
+            generation = state.generation + 1
+            scale = _fit_scale(sample)
+            # Los archivos nuevos no los lee nadie hasta que manifest.json apunte a ellos.
+            with open(self._file(_codes_name(generation)), "wb") as f:
+                for start in range(0, state.count, _BLOCK_ROWS):
+                    f.write(_quantize(np.asarray(state.vectors[start:start + _BLOCK_ROWS]), scale).tobytes())
+            np.save(self._file(_scale_name(generation)), scale)
+            self._write_manifest(generation)
+            for name in (_codes_name(state.generation), _scale_name(state.generation)):
+                try:
+                    self._file(name).unlink()
+                except OSError:
+                    pass  # Sin archivo (índice vacío) o todavía mapeado en Windows: se borra al compactar.
+            self._refresh()
+
+    # --- IVF ---
+
+    def train_ivf(self, sample: Optional[np.ndarray] = None, expected_rows: Optional[int] = None):
+        """
+        Entrena los centroides y asigna todas las filas existentes a su lista.
+        sample/expected_rows permiten entrenar con datos de otro índice antes de cargar filas
+        (la compactación lo usa para que los centroides representen al corpus completo).
+        Como las altas, debe serializarse entre procesos (ver corpus_service.ingestion_lock).
+        """
+        with self._lock:
+            state = self._refresh()
+            nlist = self._ivf_list_count(expected_rows or state.count)
+            if sample is None:
+                sample = self.sample_vectors(self.ivf_training_rows(state.count))
+            sample = np.asarray(sample, dtype=np.float32)
+            nlist = min(nlist, len(sample))
+            if nlist == 0:
+                return
+            # La muestra completa (antes de recortarla para k-means) también fija la escala definitiva.
+            self.calibrate(sample)
+            state = self._refresh()
+            if len(sample) > nlist * _TRAIN_ROWS_PER_LIST:
+                chosen = np.random.default_rng(0).choice(len(sample), nlist * _TRAIN_ROWS_PER_LIST, replace=False)
+                sample = sample[np.sort(chosen)]
+            centroids = _spherical_kmeans(sample, nlist)
+
+            # Orden: primero las listas de todas las filas, después los centroides (que activan el IVF).
+            tmp_lists = self._file("lists.u32.tmp")
+            with open(tmp_lists, "wb") as f:
+                for start in range(0, state.count, _BLOCK_ROWS):
+                    f.write(_assign(np.asarray(state.vectors[start:start + _BLOCK_ROWS]), centroids).tobytes())
+            os.replace(tmp_lists, self._file("lists.u32"))
+            tmp_centroids = self._file("centroids.tmp.npy")
+            np.save(tmp_centroids, centroids)
+            os.replace(tmp_centroids, self._file("centroids.npy"))
+            self._refresh()
+
+    def _ivf_list_count(self, rows: int) -> int:
+        return self._ivf_lists or int(np.clip(np.sqrt(rows), 16, 65536))
+
+    def ivf_training_rows(self, rows: int) -> int:
+        """Tamaño de la muestra de entrenamiento para un índice de 'rows' filas."""
+        return self._ivf_list_count(rows) * _TRAIN_ROWS_PER_LIST
+
+    def _probe_rows(self, state: _State, query: np.ndarray) -> np.ndarray:
+        """Filas de las nprobe listas más cercanas a la consulta, más las que aún no tienen lista."""
+        scores = state.centroids @ query
+        nprobe = min(self._nprobe, len(scores))
+        probed = np.argpartition(scores, -nprobe)[-nprobe:]
+        parts = [state.list_rows[state.list_bounds[c]:state.list_bounds[c + 1]] for c in probed]
+        if state.listed < state.count:
+            parts.append(np.arange(state.listed, state.count))
+        return np.sort(np.concatenate(parts))  # Orden de fila: acceso al memmap lo más secuencial posible.
+
+    # --- Lectura ---
+
+    def _record(self, state: _State, row: int) -> Dict[str, Any]:
+        with open(self._file("records.jsonl"), "rb") as records:
+            records.seek(int(state.offsets[row]))
+            return json.loads(records.readline())
+
+    def _document(self, state: _State, row: int) -> Document:
+        record = self._record(state, row)
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def _rows_matching(self, state: _State, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Filas vivas que cumplen un filtro de igualdad estilo Chroma ({"clave": valor} o {"$and": [...]}),
+        en orden. Devuelve None si no hay filtro. Solo se puede filtrar por las claves de _FILTER_KEYS.
+        """
+        if not where:
+            return None
+        conditions = where["$and"] if "$and" in where else [{key: value} for key, value in where.items()]
+        self._sync_metadata(state)
+        rows: Optional[np.ndarray] = None
+        for condition in conditions:
+            (key, value), = condition.items()
+            if key not in _FILTER_KEYS:
+                raise ValueError(f"No se puede filtrar por '{key}': el índice solo indexa {', '.join(_FILTER_KEYS)}.")
+            if isinstance(value, dict):
+                value = value.get("$eq")
+            with self._lock:
+                found = self._metadata().execute(
+                    "SELECT row FROM metadata WHERE key = ? AND value = ? AND row < ?", (key, value, state.count)
+                ).fetchall()
+            matches = np.fromiter((row for row, in found), dtype=np.int64, count=len(found))
+            rows = matches if rows is None else np.intersect1d(rows, matches, assume_unique=True)
+        return rows[~state.is_deleted(rows)]
+
+    # --- Metadata filtrable (metadata.sqlite) ---
+
+    def _metadata(self) -> sqlite3.Connection:
+        """Conexión a metadata.sqlite de este proceso (se usa siempre bajo self._lock)."""
+        if self._metadata_db is None:
+            db = sqlite3.connect(self._file("metadata.sqlite"), isolation_level=None, check_same_thread=False)
+            # WAL: los lectores de otros procesos no esperan a que termine un alta.
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata (key TEXT NOT NULL, value NOT NULL, row INTEGER NOT NULL, "
+                "PRIMARY KEY (key, value, row)) WITHOUT ROWID"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS indexed (id INTEGER PRIMARY KEY CHECK (id = 0), rows INTEGER NOT NULL)")
+            self._metadata_db = db
+        return self._metadata_db
+
+    def _indexed_rows(self) -> int:
+        found = self._metadata().execute("SELECT rows FROM indexed WHERE id = 0").fetchone()
+        return found[0] if found else 0
+
+    def _index_metadata(self, start: int, metadatas: List[dict]):
+        """Registra en metadata.sqlite los valores filtrables de las filas start, start + 1, ..."""
+        values = []
+        for row, metadata in enumerate(metadatas, start):
+            for key in _FILTER_KEYS:
+                value = metadata.get(key)
+                if isinstance(value, (str, int, float)):
+                    values.append((key, value, row))
+        with self._lock:
+            db = self._metadata()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._indexed_rows() > start:
+                    # Restos de un alta que se cortó antes de escribir codes.i8: esas filas se reescriben.
+                    db.execute("DELETE FROM metadata WHERE row >= ?", (start,))
+                db.executemany("INSERT OR IGNORE INTO metadata (key, value, row) VALUES (?, ?, ?)", values)
+                db.execute("INSERT OR REPLACE INTO indexed (id, rows) VALUES (0, ?)", (start + len(metadatas),))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def _sync_metadata(self, state: _State):
+        """
+        Indexa las filas que todavía no están en metadata.sqlite. Solo ocurre con índices creados antes
+        de que existiera (una vez, al primer filtro) o si un alta se cortó a mitad de camino.
+        """
+        with self._lock:
+            indexed = self._indexed_rows()
+            if indexed >= state.count:
+                return
+            with open(self._file("records.jsonl"), "rb") as records:
+                records.seek(int(state.offsets[indexed]))
+                for start in range(indexed, state.count, _METADATA_BATCH):
+                    size = min(_METADATA_BATCH, state.count - start)
+                    self._index_metadata(start, [json.loads(records.readline())["metadata"] for _ in range(size)])
+
+    def _search_rows(
+        self, state: _State, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Búsqueda en dos fases sobre todas las filas (o solo sobre 'rows' si hay filtro)."""
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        n_candidates = k * self._rescore_factor
+
+        if rows is not None and len(rows) <= max(n_candidates, _EXACT_FILTER_ROWS):
+            candidates = rows
+        else:
+            allowed = None
+            if rows is not None:
+                allowed = np.zeros(state.count, dtype=bool)
+                allowed[rows] = True
+
+            # Fase 1: score aproximado con int8. codes @ (scale * q) ≈ vectors @ q
+            weights = (state.scale * query).astype(np.float32)
+            if state.list_bounds is not None and self._nprobe > 0:
+                scan = [self._probe_rows(state, query)]
+            else:
+                scan = [np.arange(start, min(start + _BLOCK_ROWS, state.count))
+                        for start in range(0, state.count, _BLOCK_ROWS)]
+
+            buffer = np.empty((_SCORE_ROWS, self._dim), dtype=np.float32)
+            best_rows: List[np.ndarray] = []
+            best_scores: List[np.ndarray] = []
+            for block_rows in scan:
+                for start in range(0, len(block_rows), _BLOCK_ROWS):
+                    part = block_rows[start:start + _BLOCK_ROWS]
+                    keep = ~state.is_deleted(part)
+                    if allowed is not None:
+                        keep &= allowed[part]
+                    part = part[keep]
+                    if len(part) == 0:
+                        continue
+                    scores = _int8_scores(state.codes, part, weights, buffer)
+                    if len(scores) > n_candidates:
+                        top = np.argpartition(scores, -n_candidates)[-n_candidates:]
+                    else:
+                        top = np.arange(len(scores))
+                    best_rows.append(part[top])
+                    best_scores.append(scores[top])
+            if not best_rows:
+                return []
+            all_rows = np.concatenate(best_rows)
+            all_scores = np.concatenate(best_scores)
+            if len(all_rows) > n_candidates:
+                keep = np.argpartition(all_scores, -n_candidates)[-n_candidates:]
+                all_rows = all_rows[keep]
+            candidates = np.sort(all_rows)  # Lectura secuencial del memmap float32.
+
+        candidates = candidates[~state.is_deleted(candidates)]
+        if len(candidates) == 0:
+            return []
+        # Fase 2: re-scoring exacto en float32 solo sobre los candidatos.
+        exact = np.asarray(state.vectors[candidates]) @ query
+        order = np.argsort(-exact)[:k]
+        return [(int(candidates[i]), float(exact[i])) for i in order]
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        state = self._refresh()
+        if state.count == 0:
+            return []
+        rows = self._rows_matching(state, filter)
+        hits = self._search_rows(state, np.asarray(embedding, dtype=np.float32), k, rows)
+        return [(self._document(state, row), score) for row, score in hits]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def similarity_search_by_vectors(self, vectors: List[List[float]], k: int = 4) -> List[List[Document]]:
+        """Varias búsquedas de una vez (mismo contrato que rag_service.search_by_vectors)."""
+        return [self.similarity_search_by_vector(vector, k) for vector in vectors]
+
+    def _select_relevance_score_fn(self):
+        # Los scores ya son similitud coseno en [-1, 1]; los llevamos a [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    def get(
+        self, where: Optional[Dict[str, Any]] = None, limit: Optional[int] = None, **kwargs: Any
+    ) -> Dict[str, List[Any]]:
+        """Lectura por metadata con el mismo formato de salida que Chroma.get()."""
+        state = self._refresh()
+        if state.count == 0:
+            return {"ids": [], "documents": [], "metadatas": []}
+        rows = self._rows_matching(state, where)
+        if rows is None:
+            rows = np.arange(state.count)
+            rows = rows[~state.is_deleted(rows)]
+        if limit is not None:
+            rows = rows[:limit]
+        records = [self._record(state, int(row)) for row in rows]
+        return {
+            "ids": [r["id"] for r in records],
+            "documents": [r["text"] for r in records],
+            "metadatas": [r["metadata"] for r in records],
+        }
+
+    # --- Bajas y compactación ---
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, **kwargs: Any) -> int:
+        """
+        Da de baja filas por id o por filtro de metadata (marcándolas en deleted.u8).
+        Devuelve cuántas filas se dieron de baja. Igual que las altas, debe serializarse entre procesos.
+        """
+        with self._lock:
+            state = self._refresh()
+            if state.count == 0:
+                return 0
+            if where is not None:
+                rows = self._rows_matching(state, where)
+            elif ids:
+                wanted = set(ids)
+                rows = np.fromiter(
+                    (row for row in range(state.count) if self._record(state, row)["id"] in wanted), dtype=np.int64
+                )
+            else:
+                return 0
+            rows = rows[~state.is_deleted(rows)]
+            if len(rows) == 0:
+                return 0
+
+            deleted = np.zeros(state.count, dtype=np.uint8)
+            if state.deleted is not None:
+                deleted[:len(state.deleted)] = state.deleted[:state.count]
+            deleted[rows] = 1
+            # Escritura atómica: archivo temporal + rename, para que un lector nunca vea un bitmap a medias.
+            tmp_file = self._file("deleted.u8.tmp")
+            deleted.tofile(tmp_file)
+            os.replace(tmp_file, self._file("deleted.u8"))
+            self._refresh()
+            return len(rows)
+
+    def iter_live_records(self, batch_size: int = 10000) -> Iterable[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+        """Lotes (ids, textos, metadatas, vectores float32) de las filas vivas, para reconstruir el índice."""
+        state = self._refresh()
+        for start in range(0, state.count, batch_size):
+            rows = np.arange(start, min(start + batch_size, state.count))
+            rows = rows[~state.is_deleted(rows)]
+            if len(rows) == 0:
+                continue
+            records = [self._record(state, int(row)) for row in rows]
+            yield (
+                [r["id"] for r in records],
+                [r["text"] for r in records],
+                [r["metadata"] for r in records],
+                np.asarray(state.vectors[rows]),
+            )
+
+    def centroids(self) -> Optional[np.ndarray]:
+        """Centroides IVF (None si el índice todavía no se entrenó)."""
+        return self._refresh().centroids
+
+    def sample_vectors(self, n: int, seed: int = 0) -> np.ndarray:
+        """Vectores de filas vivas al azar (para medir latencia con consultas realistas)."""
+        state = self._refresh()
+        rows = np.arange(state.count)
+        rows = rows[~state.is_deleted(rows)]
+        if len(rows) == 0:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+        chosen = np.random.default_rng(seed).choice(rows, size=min(n, len(rows)), replace=False)
+        return np.asarray(state.vectors[np.sort(chosen)])
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        path: str = "./quantized_index",
+        **kwargs: Any,
+    ) -> "QuantizedVectorStore":
+        store = cls(path=path, embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas)
+        return store
+
+def _stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    """Identidad de un archivo (inodo, mtime, tamaño): cambia si se reescribe o se reemplaza con os.replace."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def _codes_name(generation: int) -> str:
+    return "codes.i8" if generation == 0 else f"codes.{generation}.i8"
+
+def _scale_name(generation: int) -> str:
+    return "scale.npy" if generation == 0 else f"scale.{generation}.npy"
+
+def _fit_scale(vectors: np.ndarray) -> np.ndarray:
+    """Escala por dimensión: máximo absoluto observado (con margen) llevado a ±127."""
+    max_abs = np.abs(vectors).max(axis=0) * 1.25
+    return (np.maximum(max_abs, 1e-6) / 127.0).astype(np.float32)
+
+def _quantize(vectors: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.uint32)
+
+def _int8_scores(codes: np.ndarray, rows: np.ndarray, weights: np.ndarray, buffer: np.ndarray) -> np.ndarray:
+    """Scores aproximados codes[rows] @ weights, de a _SCORE_ROWS filas sobre un buffer reutilizado."""
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), _SCORE_ROWS):
+        chunk = rows[start:start + _SCORE_ROWS]
+        if chunk[-1] - chunk[0] + 1 == len(chunk):
+            block_codes = codes[chunk[0]:chunk[-1] + 1]  # Rango contiguo: slice, sin copia indexada.
+        else:
+            block_codes = codes[chunk]
+        block = buffer[:len(chunk)]
+        np.copyto(block, block_codes, casting="unsafe")
+        np.dot(block, weights, out=scores[start:start + len(chunk)])
+    return scores
+
+def _spherical_kmeans(sample: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """k-means sobre vectores normalizados (similitud coseno); los centroides también se normalizan."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        assignment = np.concatenate([
+            np.argmax(sample[start:start + _BLOCK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, len(sample), _BLOCK_ROWS)
+        ])
+        counts = np.bincount(assignment, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        # Centroides sin filas: se reubican en puntos al azar de la muestra.
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
@@ -1,83 +1,319 @@
 import shutil   # Utilidades para operaciones de alto nivel con archivos (copiar, mover).
 import tempfile # Librería para crear directorios y archivos temporales que se borran solos.
 import os       # Interacción con el sistema operativo (rutas, entorno).
+import asyncio  # Tareas en segundo plano (calentamiento de modelos al iniciar).
+import time     # Medición de tiempos de arranque.
+import re       # Detección de menciones a artículos en las consultas.
+import datetime # Marcas de tiempo de los trabajos batch.
 from pathlib import Path # Manejo orientado a objetos de rutas de archivos (más moderno que os.path).
-from typing import List, Dict, Any, Optional # Tipado estático para mejor documentación y autocompletado.
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable # Tipado estático para mejor documentación y autocompletado.
 # Importaciones de FastAPI y SQLAlchemy
 from fastapi import UploadFile, HTTPException # Manejo de archivos subidos y errores HTTP.
 from sqlalchemy.orm import Session # Tipo de dato para la sesión de base de datos SQL.
+from sqlalchemy.exc import SQLAlchemyError # Errores de la base SQL (no son fallas de un archivo puntual).
 # --- Imports actualizados de LangChain (El núcleo del RAG) ---
 from langchain_community.document_loaders import PyPDFLoader # Cargador específico para leer PDFs.
 from langchain_text_splitters import RecursiveCharacterTextSplitter # Herramienta para dividir texto en fragmentos (chunks) manteniendo contexto.
 from langchain_chroma import Chroma # Base de datos vectorial (Vector Store) que usaremos.
 from langchain_ollama import ChatOllama, OllamaEmbeddings # Conectores para el modelo local Ollama (Chat y Embeddings).
 from langchain_core.prompts import ChatPromptTemplate # Clases para construir prompts (instrucciones al modelo).
-from langchain_core.runnables import RunnablePassthrough # RunnablePassthrough permite pasar datos sin modificarlos en la cadena (pipeline).
 from langchain_core.output_parsers import StrOutputParser # Convierte la respuesta del modelo (objeto) a texto plano (string).
 from langchain_core.documents import Document # Objeto base que representa un documento en LangChain.
+import chromadb # Cliente de Chroma (modo servidor para despliegues con varios workers).
+from chromadb.api.client import SharedSystemClient # Cache interna de clientes locales de Chroma.
 # Imports internos de tu proyecto
 from .. import models, config # Modelos de DB (SQL) y configuraciones generales.
+from ..database import SessionLocal # Sesiones propias para tareas fuera de una petición.
+from . import corpus_service # Lock de ingesta y versión del corpus compartidos entre workers.
+from .quantized_store import QuantizedVectorStore # Backend alternativo compacto para corpus grandes.
+from .legal_chunker import LegalTextSplitter, article_number # Chunker por artículos/capítulos/incisos.
 
 # Cargamos la configuración (URLs, nombres de modelos, rutas)
 settings = config.settings
 
-# --- 1. Configuración e Inicialización Lazy (Perezosa) ---
-# PATRÓN SINGLETON / LAZY LOADING: Definimos las variables globales como None al inicio. 
-# No conectamos inmediatamente para que la API arranque rápido y no falle si Ollama está apagado en ese preciso segundo.
+# --- 1. Configuración e Inicialización (Singletons con arranque en caliente) ---
+# PATRÓN SINGLETON: Las instancias se crean una sola vez y se reutilizan.
+# Al iniciar la API, warm_up_with_retry() las crea por adelantado (ver main.py) para que
+# el primer usuario no pague la apertura de Chroma ni la carga inicial de los modelos.
+# Si la inicialización falla, NO se reintenta en cada petición: se espera con backoff exponencial.
 
 _vector_store = None
-_ollama_llm = None
+_llms: Dict[str, ChatOllama] = {} # Un ChatOllama por ruta ("factual" / "analytical"), ver route_config().
+_summary_store = None # Resúmenes por documento: store aparte para no mezclarlos con los artículos.
 _retriever = None
+_store_location: Optional[str] = None # Carpeta/colección con la que se abrió _vector_store.
+
+# Registro de fallos por componente: nombre -> (intentos fallidos, instante del próximo reintento).
+_init_failures: Dict[str, Tuple[int, float]] = {}
+
+# Versión del corpus con la que se abrieron las instancias de este worker (ver corpus_service).
+_seen_corpus_version: Optional[int] = None
+_last_version_check = 0.0
+
+# Métricas de arranque en frío (segundos desde que se importó el módulo ≈ inicio del proceso).
+_PROCESS_START = time.monotonic()
+_startup_metrics: Dict[str, Any] = {"ready": False}
+
+def _retry_delay(attempts: int) -> float:
+    """Backoff exponencial acotado: base, 2*base, 4*base... hasta INIT_RETRY_MAX_DELAY."""
+    return min(settings.INIT_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)), settings.INIT_RETRY_MAX_DELAY)
+
+def _can_retry(component: str) -> bool:
+    """Indica si ya pasó el tiempo de espera desde el último fallo del componente."""
+    failure = _init_failures.get(component)
+    return failure is None or time.monotonic() >= failure[1]
+
+def _register_failure(component: str, error: Exception):
+    attempts = _init_failures.get(component, (0, 0.0))[0] + 1
+    delay = _retry_delay(attempts)
+    _init_failures[component] = (attempts, time.monotonic() + delay)
+    print(f"Error inicializando {component} (intento {attempts}): {error}. Próximo reintento en {delay:.0f}s.")
+
+# --- Ruteo por tipo de consulta ---
+# No todas las preguntas cuestan lo mismo: "¿Está vigente la ley 27.275?" no necesita el modelo
+# grande ni una respuesta sin límite de longitud. Cada consulta se clasifica con reglas baratas
+# (sin llamar a ningún modelo) y se envía a la ruta correspondiente:
+#   - "factual":    consultas puntuales -> FAST_OLLAMA_MODEL con num_predict/num_ctx acotados.
+#   - "analytical": análisis, comparaciones, resúmenes -> OLLAMA_MODEL con los límites principales.
+
+ROUTES = ("factual", "analytical")
+
+# Pistas de análisis: si aparecen, la consulta va siempre al modelo principal.
+ANALYTICAL_HINTS_RE = re.compile(
+    r"\b(analiz|compar|resum|explic|diferenci|implicanc|evalu|desarroll|fundament|"
+    r"por\s+qu[ée]|ventajas|desventajas|consecuencias|impacto|relaci[óo]n|critic|detall)",
+    re.IGNORECASE
+)
+# Pistas de consulta puntual: preguntas de sí/no, fechas, números, nombres, vigencia.
+# Solo estas van a la ruta rápida: una pregunta abierta corta ("¿Qué establece la ley 27.275 sobre...?")
+# necesita una respuesta completa, y el tope de salida de la ruta rápida la cortaría.
+# "vigente" y "derogado" cuentan solo en forma de sí/no, al principio o al final de la pregunta
+# ("¿Está vigente la ley 25.326?", "¿La ley 26.522 fue derogada?"); en medio de una pregunta abierta
+# ("¿Qué obligaciones impone la normativa vigente...?") no indican una respuesta corta.
+_IN_FORCE = r"(est[áa]n?|sigue|siguen|contin[úu]an?)\s+(a[úu]n\s+|todav[íi]a\s+)?vigentes?"
+_REPEALED = r"(fue|fueron|est[áa]n?|ha\s+sido|han\s+sido)\s+derogad[oa]s?"
+FACTUAL_HINTS_RE = re.compile(
+    rf"(s[íi]\s+o\s+no|^\W*({_IN_FORCE}|{_REPEALED})\b|\b({_IN_FORCE}|{_REPEALED})\W*$|"
+    r"^\W*(cu[áa]ndo|qui[ée]n(es)?|cu[áa]nt[oa]s?|d[óo]nde|en\s+qu[ée]\s+fecha|qu[ée]\s+(fecha|n[úu]mero|d[íi]a))\b)",
+    re.IGNORECASE
+)
+def classify_query(query: str) -> str:
+    """
+    Clasificación heurística y gratuita (solo regex) de la consulta: 'factual' o 'analytical'.
+    Ante la duda, 'analytical': es más caro, pero no trunca respuestas.
+    """
+    if not settings.ROUTING_ENABLED or ANALYTICAL_HINTS_RE.search(query):
+        return "analytical"
+    if FACTUAL_HINTS_RE.search(query):
+        return "factual"
+    return "analytical"
+
+def route_config(route: str) -> Dict[str, Any]:
+    """Modelo, límites de generación y keep-alive de cada ruta (ver config.Settings)."""
+    if route == "factual":
+        model = settings.FAST_OLLAMA_MODEL or settings.OLLAMA_MODEL
+        return {
+            "model": model,
+            "num_predict": settings.FAST_NUM_PREDICT,
+            # Si la ruta rápida usa el MISMO modelo, conservamos su num_ctx: cambiarlo obligaría
+            # a Ollama a recargar el modelo en cada alternancia entre rutas.
+            "num_ctx": settings.FAST_NUM_CTX if model != settings.OLLAMA_MODEL else settings.MAIN_NUM_CTX,
+            "keep_alive": settings.FAST_KEEP_ALIVE,
+        }
+    return {
+        "model": settings.OLLAMA_MODEL,
+        "num_predict": settings.MAIN_NUM_PREDICT,
+        "num_ctx": settings.MAIN_NUM_CTX,
+        "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+    }
 
 #Conexion a Ollama LLM
-def get_llm():
+def get_llm(route: str = "analytical"):
 
     """
-    Singleton para obtener la instancia del LLM (ChatOllama).
-    Si ya existe, la devuelve. Si no, la crea.
+    Singleton (uno por ruta) para obtener la instancia del LLM (ChatOllama).
+    Si ya existe, la devuelve. Si no, la crea (respetando el backoff tras un fallo).
     """
-    global _ollama_llm # Referenciamos la variable global.
+    component = f"llm:{route}"
     
-    if _ollama_llm is None: # Si aún no se ha creado...
+    if route not in _llms and _can_retry(component): # Si aún no se ha creado...
         try:
+            config_route = route_config(route)
             # Instanciamos la conexión con el modelo local.
-            _ollama_llm = ChatOllama(
+            _llms[route] = ChatOllama(
                 base_url=settings.OLLAMA_BASE_URL, # URL del servidor Ollama 
-                model=settings.OLLAMA_MODEL,       # Modelo a usar 
-                temperature=0.3  # BAJA TEMPERATURA: Crucial para documentos legales. 
+                model=config_route["model"],       # Modelo a usar según la ruta
+                temperature=0.3,  # BAJA TEMPERATURA: Crucial para documentos legales. 
                 # Reduce la creatividad del modelo y brinda respuestas mas concretas.
+                num_predict=config_route["num_predict"], # Tope de tokens de salida (None = sin tope).
+                num_ctx=config_route["num_ctx"],         # Ventana de contexto (None = la del modelo).
+                keep_alive=config_route["keep_alive"]    # Mantiene el modelo residente entre peticiones.
             )
+            _init_failures.pop(component, None)
         except Exception as e:
             # Capturamos errores de conexión para logging sin tumbar la app completa.
-            print(f"Error conectando a Ollama: {e}")
+            _register_failure(component, e)
             
-    return _ollama_llm # Retornamos la instancia lista para usar.
+    return _llms.get(route) # Retornamos la instancia lista para usar.
 
 # Conexion a ChromaDB
 def get_vector_store():
     """
-    Singleton para obtener la instancia de ChromaDB.
+    Singleton para obtener la instancia del vector store (ChromaDB o el índice cuantizado,
+    según VECTOR_STORE_BACKEND).
     Aquí es donde se guardan y buscan los vectores (representaciones matemáticas del texto).
     """
-    global _vector_store
+    global _vector_store, _store_location
     
-    if _vector_store is None:
+    _sync_corpus_version() # Si otro worker cambió el corpus, reabrimos antes de buscar.
+
+    if _vector_store is None and _can_retry("vector_store"):
         try:
+            started = time.monotonic()
+            # La ubicación puede haber cambiado tras una compactación (ver compaction_service).
+            location = _read_store_location()
+            _check_store_location(location)
             # Configuración del modelo que convertirá texto a números (Embeddings).
             embeddings = OllamaEmbeddings(
                 base_url=settings.OLLAMA_BASE_URL,
-                model=settings.EMBEDDING_MODEL # Ej. nomic-embed-text
-            )
-            # Inicialización de ChromaDB apuntando a una carpeta local (persistencia).
-            _vector_store = Chroma(
-                persist_directory=settings.CHROMA_PATH, # Dónde se guardan los datos en disco.
-                embedding_function=embeddings # Qué función usar para calcular vectores.
+                model=settings.EMBEDDING_MODEL, # Ej. nomic-embed-text
+                keep_alive=settings.OLLAMA_KEEP_ALIVE
             )
+            _vector_store = _open_store(location, embeddings)
+            _store_location = location
+            # Solo la primera apertura: las reaperturas tras una compactación no son arranque en frío.
+            _startup_metrics.setdefault("chroma_open_s", round(time.monotonic() - started, 3))
+            _init_failures.pop("vector_store", None)
         except Exception as e:
-            print(f"Error inicializando ChromaDB: {e}")
+            _register_failure("vector_store", e)
             
     return _vector_store
 
+def _open_store(location: str, embeddings, summaries: bool = False):
+    """
+    Abre el store de la ubicación indicada según el backend configurado.
+    summaries=True abre el store hermano de resúmenes (ver corpus_service.summary_location).
+    """
+    if settings.VECTOR_STORE_BACKEND == "quantized":
+        # ÍNDICE COMPACTO: vectores int8 en archivos memory-mapped + re-scoring exacto.
+        # Lee el tamaño de sus archivos en cada búsqueda, así que ve las altas de otros workers.
+        return QuantizedVectorStore(
+            path=corpus_service.summary_location(location) if summaries else location,
+            embedding_function=embeddings,
+            rescore_factor=settings.QUANTIZED_RESCORE_FACTOR,
+            nprobe=settings.QUANTIZED_IVF_NPROBE,
+            ivf_lists=settings.QUANTIZED_IVF_LISTS,
+            ivf_min_rows=settings.QUANTIZED_IVF_MIN_ROWS
+        )
+    if settings.CHROMA_SERVER_HOST:
+        # MODO SERVIDOR: un único proceso Chroma es dueño de los datos y todos los workers
+        # le hablan por HTTP. El HttpClient reutiliza conexiones (pool keep-alive) y
+        # es un singleton por worker, así que no se abre una conexión por consulta.
+        client = chromadb.HttpClient(
+            host=settings.CHROMA_SERVER_HOST,
+            port=settings.CHROMA_SERVER_PORT
+        )
+        return Chroma(
+            client=client,
+            collection_name=corpus_service.summary_location(location) if summaries else location,
+            embedding_function=embeddings
+        )
+    # MODO LOCAL: Inicialización de ChromaDB apuntando a una carpeta local (persistencia).
+    # Los resúmenes van en otra colección de la misma carpeta.
+    collection = settings.CHROMA_COLLECTION
+    return Chroma(
+        persist_directory=location, # Dónde se guardan los datos en disco.
+        collection_name=corpus_service.summary_location(collection) if summaries else collection,
+        embedding_function=embeddings # Qué función usar para calcular vectores.
+    )
+
+def get_summary_store():
+    """
+    Store de los resúmenes por documento (summary_service). Vive aparte del principal para que los
+    resúmenes no desplacen a los artículos en las búsquedas normales, sin filtrar cada consulta.
+    """
+    global _summary_store
+    vs = get_vector_store() # Sincroniza versión y ubicación activa.
+    if not vs:
+        return None
+    if _summary_store is None:
+        try:
+            _summary_store = _open_store(_store_location, vs.embeddings, summaries=True)
+        except Exception as e:
+            print(f"No se pudo abrir el store de resúmenes: {e}")
+    return _summary_store
+
+# --- Coherencia entre workers ---
+
+def _read_store_location() -> str:
+    """Ubicación activa del vector store según la DB (o la configurada, si no se puede leer)."""
+    try:
+        with SessionLocal() as db:
+            return corpus_service.get_store_location(db)
+    except Exception as e:
+        print(f"No se pudo leer la ubicación del vector store: {e}")
+        return corpus_service.default_store_location()
+
+def _check_store_location(location: str):
+    """
+    Falla si la ubicación activa no existe pero el corpus ya tiene datos (ver corpus_service.store_must_exist):
+    Chroma y el índice cuantizado la crearían vacía sin avisar. El worker queda sin vector store
+    (readiness en 503, con reintentos) en lugar de responder como si el corpus estuviera vacío.
+    """
+    if settings.VECTOR_STORE_BACKEND == "chroma" and settings.CHROMA_SERVER_HOST:
+        client = chromadb.HttpClient(host=settings.CHROMA_SERVER_HOST, port=settings.CHROMA_SERVER_PORT)
+        exists = location in [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    else:
+        exists = os.path.isdir(location)
+    if exists:
+        return
+    with SessionLocal() as db:
+        required = corpus_service.store_must_exist(db)
+    if required:
+        raise RuntimeError(
+            f"El vector store activo ({location}) no existe y el corpus ya tiene datos. Revisar store_location "
+            "en corpus_state; para empezar a propósito con un índice vacío, crear la carpeta (o colección)"
+        )
+
+def invalidate_caches():
+    """
+    Descarta las instancias cacheadas de este worker para que se reconstruyan con el corpus nuevo.
+    En modo local el índice HNSW de Chroma vive en la memoria de cada proceso, así que hay que reabrirlo;
+    en modo servidor basta con reconstruir el retriever, salvo que una compactación haya cambiado la ubicación.
+    """
+    global _vector_store, _summary_store, _retriever
+    _retriever = None
+    local_chroma = settings.VECTOR_STORE_BACKEND == "chroma" and not settings.CHROMA_SERVER_HOST
+    if local_chroma or _read_store_location() != _store_location:
+        _vector_store = None
+        _summary_store = None
+        # Chroma reutiliza el cliente por ruta dentro del proceso: lo limpiamos para forzar la relectura.
+        SharedSystemClient.clear_system_cache()
+
+def _sync_corpus_version(force: bool = False):
+    """
+    Compara la versión del corpus guardada en la DB con la que vio este worker.
+    Se consulta como mucho cada CORPUS_VERSION_POLL_SECONDS (salvo force=True).
+    """
+    global _seen_corpus_version, _last_version_check
+
+    now = time.monotonic()
+    if not force and now - _last_version_check < settings.CORPUS_VERSION_POLL_SECONDS:
+        return
+    _last_version_check = now
+
+    try:
+        with SessionLocal() as db:
+            version = corpus_service.get_corpus_version(db)
+    except Exception as e:
+        print(f"No se pudo leer la versión del corpus: {e}")
+        return
+
+    if _seen_corpus_version is not None and version != _seen_corpus_version:
+        print(f"Corpus actualizado por otro worker (v{_seen_corpus_version} -> v{version}). Invalidando caches.")
+        invalidate_caches()
+    _seen_corpus_version = version
+
 # Configuración del Retriever
 # El 'Retriever' es la interfaz de búsqueda sobre la DB vectorial.
 def get_retriever():
@@ -95,6 +331,75 @@ def get_retriever():
     return _retriever
 
 
+# --- Arranque en caliente y Readiness ---
+
+async def warm_up() -> bool:
+    """
+    Abre Chroma y envía una petición ficticia al modelo de embeddings y al de chat,
+    para que Ollama los cargue en memoria antes de la primera consulta real.
+    Devuelve True si todos los componentes quedaron listos.
+    """
+    # Abrir Chroma toca disco: lo hacemos en un hilo para no bloquear el event loop.
+    vs = await asyncio.to_thread(get_vector_store)
+    llms = {route: get_llm(route) for route in ROUTES}
+    if not vs or not all(llms.values()):
+        return False
+
+    try:
+        started = time.monotonic()
+        await vs.embeddings.aembed_query("calentamiento")
+        _startup_metrics["embedding_warmup_s"] = round(time.monotonic() - started, 3)
+
+        # Calentamos cada modelo distinto una sola vez (si ambas rutas comparten modelo, uno basta).
+        warmed = set()
+        for route, llm in llms.items():
+            config_route = route_config(route)
+            if config_route["model"] in warmed:
+                continue
+            started = time.monotonic()
+            # num_predict=1: solo nos interesa que el modelo quede cargado, no la respuesta.
+            # num_ctx igual al de la ruta: con otro valor Ollama recargaría el modelo en la primera consulta.
+            options = {"num_predict": 1}
+            if config_route["num_ctx"]:
+                options["num_ctx"] = config_route["num_ctx"]
+            await llm.ainvoke("Responde solo: ok", options=options)
+            _startup_metrics[f"llm_warmup_s:{route}"] = round(time.monotonic() - started, 3)
+            warmed.add(config_route["model"])
+    except Exception as e:
+        _register_failure("warmup", e)
+        return False
+
+    _init_failures.pop("warmup", None)
+    _startup_metrics["ready"] = True
+    _startup_metrics["ready_after_s"] = round(time.monotonic() - _PROCESS_START, 3)
+    print(f"LegislatiBot listo en {_startup_metrics['ready_after_s']}s.")
+    return True
+
+async def warm_up_with_retry():
+    """
+    Ejecuta warm_up() hasta que tenga éxito, esperando con backoff exponencial entre intentos.
+    Pensada para lanzarse como tarea de fondo desde el lifespan de la aplicación.
+    """
+    attempts = 0
+    while not await warm_up():
+        attempts += 1
+        await asyncio.sleep(_retry_delay(attempts))
+
+def get_readiness() -> Dict[str, Any]:
+    """
+    Estado de preparación del servicio RAG y métricas de arranque en frío.
+    Si el calentamiento está desactivado, basta con que Chroma y el LLM estén inicializados.
+    """
+    if not _startup_metrics["ready"] and not settings.WARMUP_ON_STARTUP:
+        _startup_metrics["ready"] = get_vector_store() is not None and all(get_llm(route) for route in ROUTES)
+    status = dict(_startup_metrics)
+    status["pending_retries"] = {
+        component: {"attempts": attempts, "retry_in_s": round(max(retry_at - time.monotonic(), 0), 1)}
+        for component, (attempts, retry_at) in _init_failures.items()
+    }
+    return status
+
+
 # --- 2. Plantilla de Prompt ---
 # Definimos la personalidad y reglas estrictas para el bot.
 RAG_TEMPLATE = """
@@ -117,13 +422,56 @@ RESPUESTA:
 # Creamos el objeto Template de LangChain listo para recibir variables.
 rag_prompt = ChatPromptTemplate.from_template(RAG_TEMPLATE)
 
+# Preguntas sobre un documento completo ("Resumí la ley X", "¿De qué trata...?"): se responden
+# con los resúmenes precalculados (ver summary_service) en lugar de fragmentos sueltos.
+DOCUMENT_QUERY_RE = re.compile(
+    r"\b(resum|s[íi]ntesis|de\s+qu[ée]\s+trata|sobre\s+qu[ée]\s+trata|panorama|"
+    r"idea\s+general|en\s+t[ée]rminos\s+generales|contenido\s+general)",
+    re.IGNORECASE
+)
+
+# Menciones a un artículo en la pregunta: "artículo 14", "art. 5", "articulo 3 bis".
+ARTICLE_QUERY_RE = re.compile(
+    r"\bart(?:[íi]culo|\.)\s*(?P<num>\d+)\s*(?:°|º)?\s*(?P<suffix>bis|ter|quater)?\b",
+    re.IGNORECASE
+)
+
+# Menciones a una ley en la pregunta: "ley 26.522", "Ley N° 27275", "ley nro. 25.326".
+LAW_QUERY_RE = re.compile(
+    r"\bley\s*(?:n(?:ro)?\.?\s*[°º]?\s*)?(?P<num>\d{1,3}(?:\.\d{3})+|\d{4,6})\b",
+    re.IGNORECASE
+)
+
 
 # --- 3. Funciones de Lógica RAG (Optimizadas) ---
 
-async def process_and_store_pdfs(files: List[UploadFile], db: Session, admin_id: int):
+def get_text_splitter():
+    """
+    Devuelve el splitter configurado en CHUNKER.
+    'legal': corta en TÍTULO/CAPÍTULO/ARTÍCULO/incisos y guarda esos números como metadata.
+    'recursive': corte genérico por caracteres (comportamiento original).
+    """
+    if settings.CHUNKER == "recursive":
+        # chunk_size=1000: Tamaño moderado. Ni muy corto (pierde sentido) ni muy largo (confunde al LLM).
+        # chunk_overlap=200: Solapamiento para no cortar frases a la mitad entre chunks.
+        return RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            add_start_index=True # Guarda la posición del caracter inicial (útil para citas).
+        )
+    return LegalTextSplitter(max_chars=settings.CHUNK_MAX_CHARS, overlap=settings.CHUNK_OVERLAP)
+
+async def process_and_store_pdfs(
+    files: List[UploadFile],
+    db: Session,
+    admin_id: int,
+    on_document_stored: Optional[Callable[[int, str, List[Tuple[Any, str]]], None]] = None
+):
     """
     Procesa PDFs de manera asíncrona (ETL: Extract, Transform, Load).
     Recibe archivos crudos, extrae texto, vectoriza y guarda.
+    on_document_stored(document_id, filename, páginas) se llama por cada documento una vez guardado
+    (lo usa el router para programar la construcción de resúmenes en segundo plano).
     """
     vs = get_vector_store()
     
@@ -133,6 +481,7 @@ async def process_and_store_pdfs(files: List[UploadFile], db: Session, admin_id:
         
     processed_files = [] # Lista para guardar nombres de archivos exitosos.
     all_splits = []      # Lista acumuladora de todos los fragmentos de texto.
+    stored_pages = []    # (document_id, filename, [(página, texto)]) para los resúmenes.
 
     # Context Manager: Crea una carpeta temporal que se autodestruye al salir del 'with'.
     # Esto es vital para no llenar el servidor de archivos basura.
@@ -153,30 +502,38 @@ async def process_and_store_pdfs(files: List[UploadFile], db: Session, admin_id:
                 docs = loader.load() # Carga el texto en memoria.
                 
                 # --- FASE 2: TRANSFORMAR (CHUNKING) ---
-                # Configuración crítica para RAG:
-                # chunk_size=1000: Tamaño moderado. Ni muy corto (pierde sentido) ni muy largo (confunde al LLM).
-                # chunk_overlap=200: Solapamiento para no cortar frases a la mitad entre chunks.
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000, 
-                    chunk_overlap=200,
-                    add_start_index=True # Guarda la posición del caracter inicial (útil para citas).
-                )
+                # Por defecto, un fragmento por artículo (ver legal_chunker); CHUNKER="recursive" vuelve al corte genérico.
+                text_splitter = get_text_splitter()
                 splits = text_splitter.split_documents(docs) # Ejecuta la división.
                 
+                # --- LOGGING EN SQL ---
+                # Guardamos el registro administrativo en PostgreSQL (quién subió qué y cuándo).
+                # flush() asigna el id sin confirmar: el commit se hace recién tras la vectorización.
+                db_doc = models.Document(filename=file.filename, admin_id=admin_id)
+                db.add(db_doc)
+                db.flush()
+
                 # Enriquecimiento de Metadata:
-                # Agregamos el nombre del archivo a cada fragmento para poder citarlo después.
+                # Agregamos el nombre del archivo a cada fragmento para poder citarlo después,
+                # y el id del documento para poder borrarlo o reemplazarlo en bloque.
                 for split in splits:
                     split.metadata["filename"] = file.filename
                     split.metadata["source"] = file.filename 
+                    split.metadata["document_id"] = db_doc.id
 
                 all_splits.extend(splits) # Agregamos a la lista maestra.
-                
-                # --- LOGGING EN SQL ---
-                # Guardamos el registro administrativo en PostgreSQL (quién subió qué y cuándo).
-                db_doc = models.Document(filename=file.filename, admin_id=admin_id)
-                db.add(db_doc)
                 processed_files.append(file.filename)
+                stored_pages.append((
+                    db_doc.id,
+                    file.filename,
+                    [(doc.metadata.get("page", i), doc.page_content) for i, doc in enumerate(docs)]
+                ))
 
+            except SQLAlchemyError:
+                # Un error de la base (p. ej. esquema desactualizado) fallaría igual en todos los archivos:
+                # lo propagamos en lugar de responder 201 sin haber guardado nada.
+                db.rollback()
+                raise
             except Exception as e:
                 print(f"Error procesando {file.filename}: {e}")
                 continue # Si falla un archivo, seguimos con el siguiente (Resiliencia).
@@ -186,14 +543,91 @@ async def process_and_store_pdfs(files: List[UploadFile], db: Session, admin_id:
     # --- FASE 3: CARGAR (VECTORIZACIÓN) ---
     if all_splits:
         print(f"Vectorizando {len(all_splits)} fragmentos...")
-        # Esta línea es la pesada: envía textos al modelo de embeddings y guarda vectores en Chroma.
-        vs.add_documents(documents=all_splits)
-        print("Vectorización finalizada.")
-        
-        db.commit() # Confirmamos los cambios en PostgreSQL solo si la vectorización funcionó.
+        # Es la parte pesada y bloqueante: la ejecutamos en un hilo para no congelar el event loop.
+        version = await asyncio.to_thread(store_chunks, all_splits, db)
+        print(f"Vectorización finalizada (corpus v{version}).")
+
+        if on_document_stored:
+            for document_id, filename, pages in stored_pages:
+                on_document_stored(document_id, filename, pages)
     
     return processed_files
 
+def store_chunks(splits: List[Document], db: Session, summaries: bool = False) -> int:
+    """
+    ESCRITOR ÚNICO: guarda los fragmentos bajo el lock de ingesta (compartido entre procesos),
+    publica la nueva versión del corpus y confirma los registros SQL en la misma sección crítica.
+    summaries=True los guarda en el store de resúmenes. Devuelve la nueva versión.
+    """
+    global _seen_corpus_version
+
+    with corpus_service.ingestion_lock():
+        # Antes de escribir nos aseguramos de no usar un índice desactualizado por otro worker.
+        _sync_corpus_version(force=True)
+        vs = get_summary_store() if summaries else get_vector_store()
+        if not vs:
+            raise HTTPException(status_code=503, detail="El sistema vectorial no está disponible.")
+
+        # Esta línea es la pesada: envía textos al modelo de embeddings y guarda vectores en Chroma.
+        vs.add_documents(documents=splits)
+        version = corpus_service.bump_corpus_version(db)
+        db.commit() # Confirmamos los cambios en SQL solo si la vectorización funcionó.
+
+    # Este worker ya tiene los datos nuevos en memoria: no necesita reabrir Chroma.
+    _seen_corpus_version = version
+    return version
+
+def delete_chunks_where(vs, where: Dict[str, Any]) -> int:
+    """Borra en bloque los fragmentos que cumplen un filtro de metadata. Devuelve cuántos borró."""
+    if isinstance(vs, QuantizedVectorStore):
+        return vs.delete(where=where)
+
+    ids = vs._collection.get(where=where, include=[])["ids"]
+    for start in range(0, len(ids), 5000): # Lotes para no superar el máximo de Chroma por llamada.
+        vs._collection.delete(ids=ids[start:start + 5000])
+    return len(ids)
+
+def remove_document(db: Session, document: models.Document, retire: bool) -> Dict[str, Any]:
+    """
+    Quita del índice los fragmentos de un documento y publica una nueva versión del corpus.
+    retire=True conserva el registro SQL (marcado como retirado); retire=False también lo borra.
+    Es bloqueante (toma el lock de ingesta): llamar desde un endpoint síncrono o un hilo.
+    """
+    global _seen_corpus_version
+
+    with corpus_service.ingestion_lock():
+        _sync_corpus_version(force=True)
+        vs = get_vector_store()
+        if not vs:
+            raise HTTPException(status_code=503, detail="El sistema vectorial no está disponible.")
+
+        removed = delete_chunks_where(vs, {"document_id": document.id})
+        if removed == 0:
+            # Documentos subidos antes de guardar 'document_id': se identifican por nombre de archivo,
+            # siempre que ningún otro documento vigente comparta ese nombre.
+            namesakes = db.query(models.Document).filter(
+                models.Document.filename == document.filename,
+                models.Document.id != document.id,
+                models.Document.retired_at.is_(None)
+            ).count()
+            if namesakes == 0:
+                removed = delete_chunks_where(vs, {"filename": document.filename})
+        summary_store = get_summary_store()
+        if summary_store:
+            removed += delete_chunks_where(summary_store, {"document_id": document.id})
+
+        if retire:
+            document.retired_at = datetime.datetime.utcnow()
+        else:
+            db.query(models.SummaryBuild).filter(models.SummaryBuild.document_id == document.id).delete()
+            db.delete(document)
+        version = corpus_service.bump_corpus_version(db)
+        db.commit()
+
+    # Este worker ya aplicó el borrado sobre su propia instancia: no necesita reabrir.
+    _seen_corpus_version = version
+    return {"removed_chunks": removed, "corpus_version": version}
+
 def format_docs(docs: List[Document]) -> str:
     """
     Función auxiliar para limpiar y formatear los documentos recuperados
@@ -211,48 +645,207 @@ def format_docs(docs: List[Document]) -> str:
     # Unimos todos los fragmentos con saltos de línea.
     return "\n\n".join(formatted)
 
-async def generate_rag_response(query: str):
+async def generate_rag_response(
+    query: str,
+    db: Optional[Session] = None,
+    docs: Optional[List[Document]] = None,
+    embedding: Optional[List[float]] = None
+):
     """
     Función principal que ejecuta la cadena RAG.
     Usa LCEL (LangChain Expression Language) para un flujo limpio.
+    La consulta se enruta al modelo rápido o al principal (ver classify_query); si se pasa 'db',
+    se registra la ruta elegida y la latencia de generación (solo el modelo, sin la recuperación)
+    para las estadísticas de administración.
+    docs/embedding: contexto ya recuperado con retrieve_context (evita vectorizar la pregunta otra vez).
     """
-    llm = get_llm()
-    retriever_instance = get_retriever()
+    route = classify_query(query)
+    llm = get_llm(route)
     
-    if not llm or not retriever_instance:
+    if not llm or not get_retriever():
         raise HTTPException(status_code=503, detail="Servicio de IA no disponible.")
 
+    # Paso 1: se buscan los docs (exacto por artículo o vectorial), en un hilo para no bloquear el event loop.
+    if docs is None:
+        docs, embedding = await asyncio.to_thread(retrieve_context, query)
+
+    # Preguntas sobre un documento entero: prompt chico y constante armado con resúmenes precalculados.
+    if is_document_level_query(query):
+        summaries = await asyncio.to_thread(retrieve_summaries, query, docs, embedding)
+        if summaries:
+            started = time.monotonic()
+            response = await generate_answer_from_docs(query, summaries, route="analytical")
+            if db is not None:
+                record_generation_metric(db, "summary", get_llm("analytical").model, (time.monotonic() - started) * 1000)
+            _record_first_answer()
+            return response
+
     # --- DEFINICIÓN DE LA CADENA (CHAIN) ---
     # La sintaxis de 'pipe' (|) pasa la salida de uno como entrada del siguiente.
     chain = (
-        {
-            # Paso 1: 'context' se llena buscando docs y formateándolos.
-            "context": retriever_instance | format_docs, 
-            # Paso 2: 'question' simplemente pasa la pregunta del usuario tal cual.
-            "question": RunnablePassthrough()
-        }
-        | rag_prompt       # Paso 3: Se llena la plantilla del prompt con context y question.
-        | llm              # Paso 4: Se envía el prompt al modelo (Ollama).
-        | StrOutputParser() # Paso 5: Se limpia la respuesta (de objeto AIMessage a string).
+        rag_prompt         # Paso 2: Se llena la plantilla del prompt con context y question.
+        | llm              # Paso 3: Se envía el prompt al modelo (Ollama).
+        | StrOutputParser() # Paso 4: Se limpia la respuesta (de objeto AIMessage a string).
     )
     
     # EJECUCIÓN ASÍNCRONA
     # .ainvoke() permite que FastAPI maneje otras peticiones mientras la IA "piensa".
-    response = await chain.ainvoke(query)
+    # Medimos solo la generación: la recuperación no depende de la ruta elegida.
+    started = time.monotonic()
+    response = await chain.ainvoke({"context": format_docs(docs), "question": query})
+    if db is not None:
+        record_generation_metric(db, route, llm.model, (time.monotonic() - started) * 1000)
+    _record_first_answer()
     return response
 
+def _record_first_answer():
+    """Métrica de arranque en frío: cuánto tardó el proceso en entregar su primera respuesta."""
+    if "first_answer_after_s" not in _startup_metrics:
+        _startup_metrics["first_answer_after_s"] = round(time.monotonic() - _PROCESS_START, 3)
+
 def get_relevant_documents(query: str) -> List[Dict[str, Any]]:
     """
     Función extra para la UI: Permite mostrar "Fuentes" o "Referencias"
     sin generar una respuesta de chat completa.
     """
-    retriever_instance = get_retriever()
-    if not retriever_instance:
-        return []
-    
     # Invocación síncrona directa al buscador (rápido).
-    docs = retriever_instance.invoke(query)
-    
+    docs = retrieve_documents(query)
+    return docs_to_sources(docs)
+
+def retrieve_documents(query: str, k: int = 5) -> List[Document]:
+    """
+    Recupera el contexto de una consulta.
+    Si la pregunta menciona un artículo ("¿Qué dice el artículo 14?"), se busca primero por la
+    metadata 'articulo' que guarda el chunker legal, sin pasar por la búsqueda vectorial.
+    """
+    return retrieve_context(query, k)[0]
+
+def retrieve_context(query: str, k: int = 5) -> Tuple[List[Document], Optional[List[float]]]:
+    """
+    Igual que retrieve_documents, pero devuelve también el embedding de la pregunta (None si se
+    resolvió por artículo sin búsqueda vectorial), para reutilizarlo en vez de vectorizarla otra vez.
+    """
+    vs = get_vector_store()
+    if not vs:
+        return [], None
+
+    match = ARTICLE_QUERY_RE.search(query)
+    if match:
+        docs = _lookup_article(article_number(match), query, k)
+        if docs:
+            return docs, None
+
+    embedding = vs.embeddings.embed_query(query)
+    return vs.similarity_search_by_vector(embedding, k=k), embedding
+
+def is_document_level_query(query: str) -> bool:
+    """True si la pregunta apunta a un documento completo (y no a un artículo puntual)."""
+    return (
+        settings.SUMMARIES_ENABLED
+        and DOCUMENT_QUERY_RE.search(query) is not None
+        and ARTICLE_QUERY_RE.search(query) is None
+    )
+
+def retrieve_summaries(
+    query: str, docs: List[Document], embedding: Optional[List[float]] = None
+) -> List[Document]:
+    """
+    Contexto para preguntas sobre un documento completo: el resumen de ESE documento más, como
+    mucho, SUMMARY_MAX_SECTIONS resúmenes de sección (en orden de lectura). El tamaño del prompt
+    queda acotado sin importar la longitud del documento.
+    docs/embedding son los de retrieve_context: deciden el documento y ordenan las secciones sin
+    volver a vectorizar la pregunta.
+    Devuelve [] si no se identifica el documento o si todavía no tiene resúmenes (se usa el RAG normal).
+    """
+    document_id = _target_document_id(query, docs)
+    summary_store = get_summary_store()
+    if document_id is None or not summary_store:
+        return []
+
+    found = summary_store.get(
+        where={"$and": [{"document_id": document_id}, {"summary_level": "document"}]}, limit=1
+    )
+    if not found["ids"]:
+        return []
+
+    document_summary = Document(page_content=found["documents"][0], metadata=found["metadatas"][0] or {})
+    if embedding is None:
+        embedding = summary_store.embeddings.embed_query(query)
+    sections = summary_store.similarity_search_by_vector(
+        embedding,
+        k=settings.SUMMARY_MAX_SECTIONS,
+        filter={"$and": [{"document_id": document_id}, {"summary_level": "section"}]}
+    )
+    sections.sort(key=lambda d: d.metadata.get("position", 0))
+    return [document_summary] + sections
+
+def _target_document_id(query: str, docs: List[Document]) -> Optional[int]:
+    """
+    Documento al que apunta la pregunta: el que nombra (número de ley o archivo) o, si no nombra
+    ninguno, el del fragmento más parecido del corpus (docs[0]). Nunca se elige por similitud entre
+    resúmenes: si la ley pedida no tiene resumen, la respuesta no debe salir del resumen de otra ley.
+    """
+    named = documents_named_in(query)
+    if named is not None:
+        return named[0].id if len(named) == 1 else None
+    return docs[0].metadata.get("document_id") if docs else None
+
+def documents_named_in(query: str) -> Optional[List[models.Document]]:
+    """
+    Documentos vigentes que la pregunta nombra, por número de ley ("ley 26.522") o por nombre
+    de archivo. None si la pregunta no nombra ninguno; [] si nombra uno que no está en el corpus.
+    """
+    law = LAW_QUERY_RE.search(query)
+    number = law.group("num").replace(".", "") if law else None
+    lowered = query.lower()
+
+    db = SessionLocal()
+    try:
+        documents = db.query(models.Document).filter(models.Document.retired_at.is_(None)).all()
+    finally:
+        db.close()
+
+    named = []
+    for document in documents:
+        stem = Path(document.filename).stem.lower()
+        # "Ley 26.522 - Servicios.pdf" y "ley_26522.pdf" se comparan como "26522".
+        digits = re.sub(r"(?<=\d)\.(?=\d{3})", "", document.filename)
+        if (number and re.search(rf"(?<!\d){number}(?!\d)", digits)) or (len(stem) >= 4 and stem in lowered):
+            named.append(document)
+    if named or number:
+        return named
+    return None
+
+def _lookup_article(article: str, query: str, k: int) -> List[Document]:
+    """
+    Búsqueda exacta por número de artículo, restringida a la ley o archivo que nombre la pregunta.
+    Si hay más coincidencias que k (el mismo artículo en varias leyes, o un artículo largo dividido),
+    se desempata con búsqueda vectorial restringida a ese artículo.
+    """
+    named = documents_named_in(query)
+    if named == []:
+        return [] # Nombra una ley que no está en el corpus: mejor la búsqueda normal que otra ley.
+    if named is None:
+        filters = [{"articulo": article}]
+    else:
+        filters = [{"$and": [{"articulo": article}, {"filename": d.filename}]} for d in named]
+
+    vs = get_vector_store()
+    docs = []
+    for where in filters:
+        found = vs.get(where=where, limit=k + 1)
+        if len(found["ids"]) > k:
+            docs.extend(vs.similarity_search(query, k=k, filter=where))
+            continue
+        docs.extend(
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(found["documents"], found["metadatas"])
+        )
+    # Orden de lectura dentro de cada documento (las partes de un artículo largo, en secuencia).
+    return sorted(docs, key=lambda d: (str(d.metadata.get("filename", "")), d.metadata.get("start_index", 0)))
+
+def docs_to_sources(docs: List[Document]) -> List[Dict[str, Any]]:
+    """Convierte documentos recuperados al formato de "Fuentes" que consume el Frontend."""
     sources = []
     for doc in docs:
         # Construimos un diccionario limpio para enviar al Frontend (React).
@@ -264,6 +857,166 @@ def get_relevant_documents(query: str) -> List[Dict[str, Any]]:
         })
     return sources
 
+# --- 4. Consultas en lote (Batch) ---
+# Para análisis masivos: las preguntas se vectorizan en UNA sola llamada al modelo de embeddings,
+# las búsquedas se resuelven en UNA consulta a Chroma y las generaciones se reparten en un pool
+# acotado por OLLAMA_NUM_PARALLEL (lo que Ollama puede atender en paralelo).
+
+_generation_semaphore: Optional[asyncio.Semaphore] = None
+
+def get_generation_semaphore() -> asyncio.Semaphore:
+    """Semáforo compartido por todos los lotes del worker: el límite es global, no por petición."""
+    global _generation_semaphore
+    if _generation_semaphore is None:
+        _generation_semaphore = asyncio.Semaphore(settings.OLLAMA_NUM_PARALLEL)
+    return _generation_semaphore
+
+def search_by_vectors(vectors: List[List[float]], k: int = 5) -> List[List[Document]]:
+    """
+    Búsqueda vectorial de varias consultas en una sola llamada a Chroma.
+    Devuelve, para cada vector, sus k documentos más parecidos.
+    """
+    vs = get_vector_store()
+    if not vs:
+        raise HTTPException(status_code=503, detail="El sistema vectorial no está disponible.")
+
+    if isinstance(vs, QuantizedVectorStore):
+        return vs.similarity_search_by_vectors(vectors, k)
+
+    # La colección de Chroma acepta una lista de embeddings y resuelve todas las búsquedas juntas.
+    result = vs._collection.query(
+        query_embeddings=vectors,
+        n_results=k,
+        include=["documents", "metadatas"]
+    )
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(result["documents"], result["metadatas"])
+    ]
+
+async def retrieve_batch(questions: List[str], k: int = 5) -> List[List[Document]]:
+    """Vectoriza todas las preguntas en una única llamada y recupera su contexto en bloque."""
+    vs = get_vector_store()
+    if not vs:
+        raise HTTPException(status_code=503, detail="El sistema vectorial no está disponible.")
+
+    vectors = await vs.embeddings.aembed_documents(questions)
+    return await asyncio.to_thread(search_by_vectors, vectors, k)
+
+async def generate_answer_from_docs(query: str, docs: List[Document], route: Optional[str] = None) -> str:
+    """Genera la respuesta con un contexto ya recuperado (evita repetir la búsqueda)."""
+    llm = get_llm(route or classify_query(query))
+    if not llm:
+        raise HTTPException(status_code=503, detail="Servicio de IA no disponible.")
+
+    chain = rag_prompt | llm | StrOutputParser()
+    return await chain.ainvoke({"context": format_docs(docs), "question": query})
+
+async def stream_batch_answers(
+    questions: List[str],
+    docs_per_question: Optional[List[List[Document]]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Responde un lote de preguntas y va entregando cada resultado en cuanto está listo
+    (no en el orden original: cada resultado lleva su 'index').
+    docs_per_question permite pasar el contexto ya recuperado con retrieve_batch.
+    """
+    if docs_per_question is None:
+        docs_per_question = await retrieve_batch(questions)
+    semaphore = get_generation_semaphore()
+
+    async def answer(index: int, question: str, docs: List[Document]) -> Dict[str, Any]:
+        result = {"index": index, "question": question, "sources": docs_to_sources(docs)}
+        async with semaphore:
+            try:
+                result["answer"] = await generate_answer_from_docs(question, docs)
+            except Exception as e:
+                # Un fallo aislado no debe tumbar el lote completo.
+                result["error"] = str(e)
+        return result
+
+    tasks = [
+        asyncio.create_task(answer(index, question, docs))
+        for index, (question, docs) in enumerate(zip(questions, docs_per_question))
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # Si el cliente corta el stream, no seguimos ocupando a Ollama con preguntas huérfanas.
+        for task in tasks:
+            task.cancel()
+
+async def run_batch_job(job_id: int):
+    """
+    Variante asíncrona: procesa un BatchJob guardado en la DB y va registrando el progreso.
+    Se ejecuta como tarea de fondo, con su propia sesión de base de datos.
+    """
+    questions = await asyncio.to_thread(_start_batch_job, job_id)
+    if questions is None:
+        return
+
+    pending: List[Dict[str, Any]] = []
+    status, error = models.BatchJobStatus.completed, None
+    try:
+        async for result in stream_batch_answers(questions):
+            pending.append(result)
+            # Guardamos de a bloques y fuera del event loop: cada resultado es una fila nueva,
+            # así que el costo por bloque no crece con el tamaño del trabajo.
+            if len(pending) >= settings.BATCH_COMMIT_EVERY:
+                await asyncio.to_thread(_save_batch_results, job_id, pending)
+                pending = []
+    except Exception as e:
+        status, error = models.BatchJobStatus.failed, str(e)
+    await asyncio.to_thread(_save_batch_results, job_id, pending, status, error)
+
+def _start_batch_job(job_id: int) -> Optional[List[str]]:
+    """Marca el trabajo como 'running' y devuelve sus preguntas (None si no existe)."""
+    db = SessionLocal()
+    try:
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+        if not job:
+            return None
+        job.status = models.BatchJobStatus.running
+        db.commit()
+        return list(job.questions)
+    finally:
+        db.close()
+
+def _save_batch_results(
+    job_id: int,
+    results: List[Dict[str, Any]],
+    status: Optional[models.BatchJobStatus] = None,
+    error: Optional[str] = None
+):
+    """Inserta un bloque de resultados y actualiza el progreso (y el estado final, si se indica)."""
+    db = SessionLocal()
+    try:
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+        if not job:
+            return
+        db.add_all(
+            models.BatchJobResult(job_id=job_id, index=result["index"], result=result)
+            for result in results
+        )
+        job.completed_count = (job.completed_count or 0) + len(results)
+        if status is not None:
+            job.status = status
+            job.error = error
+            job.finished_at = datetime.datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+def record_generation_metric(db: Session, route: str, model: str, latency_ms: float):
+    """Registra qué ruta/modelo respondió una consulta y cuánto tardó (ver /api/admin/stats/routing)."""
+    try:
+        db.add(models.GenerationMetric(route=route, model=model, latency_ms=latency_ms))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error registrando métrica de generación: {e}")
+
 def log_chat_message(
     db: Session, 
     history_id: int, 
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from .. import models, config
+from ..database import SessionLocal
+from . import rag_service
+
+settings = config.settings
+
+# --- Resúmenes jerárquicos por documento ---
+# "Resumí la ley 27.275" no se responde bien con 5 fragmentos sueltos, y meter la ley entera en el
+# prompt hace que el costo crezca con su longitud. Al subir un PDF construimos, en segundo plano,
+# un árbol de resúmenes: página -> sección (SUMMARY_SECTION_PAGES páginas) -> documento. Si hay más
+# de SUMMARY_MERGE_GROUP secciones, se combinan por grupos de ese tamaño, nivel por nivel, hasta que
+# queda un solo grupo: cada llamada al modelo recibe un prompt acotado, sea cual sea el largo de la ley.
+# Los resúmenes de página son intermedios; los de sección y documento se guardan en un store
+# aparte del principal (rag_service.get_summary_store, metadata summary_level), para que no
+# compitan con los artículos en las búsquedas normales. El borrado y la compactación los alcanzan
+# igual que al resto del corpus. En consulta, el prompt usa el resumen del documento pedido y a lo
+# sumo SUMMARY_MAX_SECTIONS resúmenes de sección: su tamaño no depende del largo de la ley.
+
+# Máximo de caracteres de una página que se envían al modelo (páginas escaneadas o muy densas).
+_PAGE_MAX_CHARS = 6000
+
+PAGE_TEMPLATE = """
+Resumí en 3 a 5 oraciones el siguiente fragmento del documento "{filename}".
+Conservá números de artículos, plazos, montos y organismos mencionados. No agregues nada que no esté en el texto.
+
+Texto:
+{text}
+
+Resumen:
+"""
+
+SECTION_TEMPLATE = """
+Estos son resúmenes consecutivos de partes del documento "{filename}".
+Integralos en un único resumen de un párrafo que indique qué regula esta parte y los artículos principales.
+
+Resúmenes:
+{text}
+
+Resumen de la sección:
+"""
+
+DOCUMENT_TEMPLATE = """
+Estos son los resúmenes, en orden, de todas las partes del documento "{filename}".
+Escribí un resumen general del documento: su objeto, a quién se aplica, sus disposiciones principales
+y la autoridad de aplicación si se menciona. Máximo 3 párrafos.
+
+Resúmenes de secciones:
+{text}
+
+Resumen del documento:
+"""
+
+page_prompt = ChatPromptTemplate.from_template(PAGE_TEMPLATE)
+section_prompt = ChatPromptTemplate.from_template(SECTION_TEMPLATE)
+document_prompt = ChatPromptTemplate.from_template(DOCUMENT_TEMPLATE)
+
+async def _summarize(prompt: ChatPromptTemplate, route: str, filename: str, text: str) -> str:
+    """Una llamada al modelo, dentro del mismo límite de concurrencia que las consultas en lote."""
+    llm = rag_service.get_llm(route)
+    if not llm:
+        raise RuntimeError("Servicio de IA no disponible.")
+    chain = prompt | llm | StrOutputParser()
+    async with rag_service.get_generation_semaphore():
+        return (await chain.ainvoke({"filename": filename, "text": text})).strip()
+
+async def build_document_summaries(document_id: int, filename: str, pages: List[Tuple[int, str]]):
+    """
+    Construye y guarda el árbol de resúmenes de un documento ya ingerido.
+    Pensado para BackgroundTasks: registra los errores en lugar de propagarlos.
+    """
+    if not settings.SUMMARIES_ENABLED:
+        return
+    pages = [(page, text.strip()) for page, text in pages if text and text.strip()]
+    if not pages:
+        return
+
+    started = time.monotonic()
+    try:
+        # 1. Páginas: el modelo rápido alcanza para condensar texto literal.
+        page_summaries = await asyncio.gather(*(
+            _summarize(page_prompt, "factual", filename, text[:_PAGE_MAX_CHARS]) for _, text in pages
+        ))
+
+        # 2. Secciones de SUMMARY_SECTION_PAGES páginas consecutivas.
+        size = max(settings.SUMMARY_SECTION_PAGES, 1)
+        groups = [
+            (pages[i][0], page_summaries[i:i + size]) for i in range(0, len(pages), size)
+        ]
+        section_summaries = await asyncio.gather(*(
+            _summarize(section_prompt, "factual", filename, "\n\n".join(summaries)) for _, summaries in groups
+        ))
+
+        # 3. Documento: síntesis de las secciones con el modelo principal, después de reducirlas por grupos.
+        parts = await _reduce(filename, list(section_summaries))
+        document_summary = await _summarize(document_prompt, "analytical", filename, "\n\n".join(parts))
+    except Exception as e:
+        print(f"Error generando los resúmenes de {filename}: {e}")
+        return
+
+    base_metadata = {"document_id": document_id, "filename": filename, "source": filename}
+    chunks = [
+        Document(
+            page_content=f"Resumen del documento {filename}:\n{document_summary}",
+            metadata={**base_metadata, "summary_level": "document", "position": 0, "page": pages[0][0]}
+        )
+    ]
+    for position, ((first_page, _), summary) in enumerate(zip(groups, section_summaries)):
+        chunks.append(Document(
+            page_content=f"Resumen de {filename} (desde la página {first_page + 1}):\n{summary}",
+            metadata={**base_metadata, "summary_level": "section", "position": position, "page": first_page}
+        ))
+
+    build_seconds = time.monotonic() - started
+    try:
+        version = await asyncio.to_thread(_store_summaries, document_id, chunks, len(pages), build_seconds)
+    except Exception as e:
+        print(f"Error guardando los resúmenes de {filename}: {e}")
+        return
+    if version is not None:
+        print(f"Resúmenes de {filename} listos en {build_seconds:.1f}s (corpus v{version}).")
+
+async def _reduce(filename: str, summaries: List[str]) -> List[str]:
+    """
+    Combina resúmenes consecutivos de a SUMMARY_MERGE_GROUP hasta que queden a lo sumo esa cantidad.
+    Los niveles intermedios no se guardan: solo sirven para armar el resumen del documento.
+    """
+    size = max(settings.SUMMARY_MERGE_GROUP, 2)
+    while len(summaries) > size:
+        summaries = await asyncio.gather(*(
+            _summarize(section_prompt, "factual", filename, "\n\n".join(summaries[i:i + size]))
+            for i in range(0, len(summaries), size)
+        ))
+    return summaries
+
+def _store_summaries(document_id: int, chunks: List[Document], pages: int, build_seconds: float) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        # El documento pudo borrarse o retirarse mientras se generaban los resúmenes.
+        document = db.query(models.Document).filter(models.Document.id == document_id).first()
+        if not document or document.retired_at is not None:
+            return None
+        db.add(models.SummaryBuild(
+            document_id=document_id,
+            pages=pages,
+            sections=len(chunks) - 1,
+            build_seconds=build_seconds
+        ))
+        # store_chunks confirma el registro junto con los fragmentos, bajo el lock de ingesta.
+        return rag_service.store_chunks(chunks, db, summaries=True)
+    finally:
+        db.close()
@@ -0,0 +1,165 @@
+"""
+Benchmark: chunker legal (por artículos) vs. RecursiveCharacterTextSplitter(1000, 200).
+
+Para cada splitter reporta cantidad de fragmentos, caracteres totales (y cuánto texto
+redundante agrega el solapamiento), artículos que quedaron enteros en un solo fragmento y,
+con --embed, el tiempo de embeddings y el hit@5: para una frase tomada del medio de cada
+artículo, si entre los 5 fragmentos más parecidos hay uno que contenga el encabezado de ese
+artículo (es decir, si el contexto recuperado permite citarlo).
+
+--check corre además los casos de CHECKS (encabezados que el chunker debe reconocer o ignorar)
+y termina con error si alguno falla; no necesita PDFs.
+
+Uso (desde backend/):
+    python -m scripts.benchmark_chunker ley_27275.pdf ley_26522.pdf
+    python -m scripts.benchmark_chunker ley_27275.pdf --embed --model nomic-embed-text
+    python -m scripts.benchmark_chunker --check
+"""
+import argparse
+import re
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.legal_chunker import ARTICLE_RE, LegalTextSplitter, article_number
+
+K = 5
+
+# (texto, [(articulo, titulo, capitulo, final del fragmento)]): un fragmento esperado por artículo.
+CHECKS = [
+    # Encabezados con raya (InfoLEG) y sufijo "bis".
+    ("ARTICULO 1° — Objeto. Primero.\nARTICULO 1 bis — Segundo.\nArtículo 2º: Tercero.",
+     [("1", None, None, "Primero."), ("1 bis", None, None, "Segundo."), ("2", None, None, "Tercero.")]),
+    # Citas a otros artículos partidas al inicio de renglón: no son encabezados.
+    ("ARTICULO 1°.- Lo previsto en el\nartículo 5. Los sujetos obligados y el\nArt. 7 de la Ley.\nARTICULO 2°.- Fin.",
+     [("1", None, None, "Ley."), ("2", None, None, "Fin.")]),
+    # Citas a capítulos y títulos partidas al inicio de renglón: tampoco.
+    ("TITULO I\nCAPITULO I - Objeto\nARTICULO 1°.- Lo dispuesto en el\ncapítulo III de la Ley 25.326 y el\n"
+     "título II del Código.\nARTICULO 2°.- Segundo.\nCapítulo Único — Final\nARTICULO 3°.- Tercero.",
+     [("1", "I", "I", "del Código."), ("2", "I", "I", "Segundo."), ("3", "I", "ÚNICO", "Tercero.")]),
+]
+
+def load_pdfs(paths: List[str]) -> List[Document]:
+    docs = []
+    for path in paths:
+        docs.extend(PyPDFLoader(path).load())
+    return docs
+
+def article_probes(docs: List[Document]) -> List[Tuple[str, str]]:
+    """(número de artículo, frase del medio del artículo) para cada artículo detectado."""
+    text = "\n".join(doc.page_content for doc in docs)
+    matches = list(ARTICLE_RE.finditer(text))
+    probes = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        body = text[match.end():following.start() if following else len(text)]
+        sentences = [s.strip() for s in re.split(r"(?<=[.;:])\s+", body) if len(s.strip()) > 40]
+        if sentences:
+            probes.append((article_number(match), sentences[len(sentences) // 2][:300]))
+    return probes
+
+def heading_pattern(article: str) -> "re.Pattern[str]":
+    return re.compile(rf"^[ \t]*(?:ART[ÍI]CULO|ART\.)\s*{re.escape(article.split()[0])}\b", re.IGNORECASE | re.MULTILINE)
+
+def evaluate(name: str, chunks: List[Document], split_s: float, probes, source_chars: int, embeddings=None) -> Dict:
+    texts = [c.page_content for c in chunks]
+    total_chars = sum(len(t) for t in texts)
+    whole = sum(
+        1 for article, sentence in probes
+        if any(heading_pattern(article).search(t) and sentence in t for t in texts)
+    )
+    stats = {
+        "splitter": name,
+        "chunks": len(chunks),
+        "chars": total_chars,
+        "redundancy": total_chars / max(source_chars, 1) - 1,
+        "whole_articles": whole / max(len(probes), 1),
+        "split_s": split_s,
+    }
+    if embeddings is not None and probes:
+        started = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        stats["embed_s"] = time.perf_counter() - started
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        queries = np.asarray(embeddings.embed_documents([s for _, s in probes]), dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        hits = 0
+        for (article, _), query in zip(probes, queries):
+            top = np.argsort(-(vectors @ query))[:K]
+            hits += any(heading_pattern(article).search(texts[i]) for i in top)
+        stats["hit@5"] = hits / len(probes)
+    return stats
+
+def run_checks() -> bool:
+    splitter = LegalTextSplitter()
+    ok = True
+    for text, expected in CHECKS:
+        chunks = splitter.split_documents([Document(page_content=text, metadata={"source": "check"})])
+        found = [
+            (c.metadata.get("articulo"), c.metadata.get("titulo"), c.metadata.get("capitulo"), c.page_content)
+            for c in chunks
+        ]
+        passed = len(found) == len(expected) and all(
+            f[:3] == e[:3] and f[3].endswith(e[3]) for f, e in zip(found, expected)
+        )
+        if not passed:
+            ok = False
+            print(f"FALLA: {text[:60]!r}\n  esperado: {expected}\n  obtenido: {[f[:3] + (f[3][-20:],) for f in found]}")
+    print(f"Casos de encabezados: {'OK' if ok else 'con fallas'} ({len(CHECKS)})")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--max-chars", type=int, default=1500)
+    parser.add_argument("--embed", action="store_true", help="Medir embeddings y hit@5 con Ollama")
+    parser.add_argument("--ollama-url", default="http://localhost:11434")
+    parser.add_argument("--model", default="nomic-embed-text")
+    parser.add_argument("--check", action="store_true", help="Correr los casos de CHECKS")
+    args = parser.parse_args()
+
+    if args.check and not run_checks():
+        sys.exit(1)
+    if not args.pdfs:
+        if not args.check:
+            parser.error("indicá al menos un PDF (o --check)")
+        return
+
+    docs = load_pdfs(args.pdfs)
+    source_chars = sum(len(d.page_content) for d in docs)
+    probes = article_probes(docs)
+
+    embeddings = None
+    if args.embed:
+        from langchain_ollama import OllamaEmbeddings
+        embeddings = OllamaEmbeddings(base_url=args.ollama_url, model=args.model)
+
+    splitters = [
+        ("recursive", RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)),
+        ("legal", LegalTextSplitter(max_chars=args.max_chars)),
+    ]
+    results = []
+    for name, splitter in splitters:
+        started = time.perf_counter()
+        chunks = splitter.split_documents(docs)
+        results.append(evaluate(name, chunks, time.perf_counter() - started, probes, source_chars, embeddings))
+
+    print(f"Páginas: {len(docs)} | caracteres: {source_chars} | artículos detectados: {len(probes)}")
+    header = f"{'splitter':<11}{'chunks':>8}{'chars':>10}{'redund.':>9}{'art. enteros':>14}{'split s':>9}"
+    if embeddings is not None:
+        header += f"{'embed s':>9}{'hit@5':>8}"
+    print(header)
+    for r in results:
+        line = (f"{r['splitter']:<11}{r['chunks']:>8}{r['chars']:>10}{r['redundancy']:>9.1%}"
+                f"{r['whole_articles']:>14.1%}{r['split_s']:>9.3f}")
+        if "embed_s" in r:
+            line += f"{r['embed_s']:>9.2f}{r['hit@5']:>8.1%}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Benchmark: índice cuantizado (int8 + re-scoring exacto) vs. Chroma.
+
+Reporta recall@5 contra una búsqueda exacta por fuerza bruta, tamaño en disco
+y latencias p50/p99 por consulta para Chroma y para el índice cuantizado, este último
+con IVF (nprobe listas por consulta) y con recorrido completo.
+
+Los vectores sintéticos se generan por bloques, así que el corpus no necesita entrar en RAM.
+Con millones de vectores conviene --skip-chroma: construir el HNSW lleva mucho más que el benchmark.
+
+Uso (desde backend/):
+    python -m scripts.benchmark_vector_store --synthetic 200000 --dim 768
+    python -m scripts.benchmark_vector_store --synthetic 1000000 --dim 768 --skip-chroma
+    python -m scripts.benchmark_vector_store --from-chroma ./persistent_chroma_db
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+
+from app.services.quantized_store import QuantizedVectorStore
+
+K = 5
+_CHUNK = 10000
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+def synthetic_chunks(n: int, dim: int, seed: int = 0) -> Iterator[np.ndarray]:
+    """
+    Vectores agrupados en clusters (más parecido a embeddings reales que ruido uniforme),
+    en bloques de _CHUNK filas. Es determinístico: recorrerlo dos veces da los mismos vectores.
+    """
+    centers = np.random.default_rng(seed).normal(size=(max(n // 500, 1), dim)).astype(np.float32)
+    for start in range(0, n, _CHUNK):
+        rng = np.random.default_rng([seed, start])
+        size = min(_CHUNK, n - start)
+        assignment = rng.integers(0, len(centers), size=size)
+        yield _normalize(centers[assignment] + 0.6 * rng.normal(size=(size, dim)).astype(np.float32))
+
+def load_chroma_vectors(collection) -> Tuple[List[str], np.ndarray]:
+    ids, vectors = [], []
+    total = collection.count()
+    for offset in range(0, total, 5000):
+        page = collection.get(include=["embeddings"], limit=5000, offset=offset)
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+    return ids, _normalize(np.asarray(vectors, dtype=np.float32))
+
+def build_chroma(path: Path, chunks: Iterator[np.ndarray]):
+    client = chromadb.PersistentClient(path=str(path))
+    collection = client.create_collection("benchmark", metadata={"hnsw:space": "cosine"})
+    batch = client.get_max_batch_size()
+    start = 0
+    for vectors in chunks:
+        for offset in range(0, len(vectors), batch):
+            chunk = vectors[offset:offset + batch]
+            chunk_ids = [str(i) for i in range(start, start + len(chunk))]
+            collection.add(ids=chunk_ids, embeddings=chunk.tolist(), documents=chunk_ids)
+            start += len(chunk)
+    return collection
+
+def build_quantized(path: Path, chunks: Iterator[np.ndarray], args) -> QuantizedVectorStore:
+    store = QuantizedVectorStore(
+        str(path), embedding_function=None, rescore_factor=args.rescore_factor,
+        nprobe=args.nprobe, ivf_lists=args.ivf_lists, ivf_min_rows=0
+    )
+    start = 0
+    for vectors in chunks:
+        chunk_ids = [str(i) for i in range(start, start + len(vectors))]
+        store.add_embeddings(chunk_ids, vectors, ids=chunk_ids)
+        start += len(vectors)
+    # Entrenamos una vez con el corpus completo (igual que tras una compactación).
+    store.train_ivf()
+    return store
+
+def exact_top_k(chunks: Iterator[np.ndarray], queries: np.ndarray) -> List[set]:
+    """Verdad de referencia por fuerza bruta, recorriendo el corpus por bloques."""
+    best_scores = np.full((len(queries), K), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), K), dtype=np.int64)
+    start = 0
+    for vectors in chunks:
+        scores = queries @ vectors.T
+        rows = np.broadcast_to(np.arange(start, start + len(vectors)), scores.shape)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, rows], axis=1)
+        top = np.argpartition(-scores, K, axis=1)[:, :K]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_rows = np.take_along_axis(rows, top, axis=1)
+        start += len(vectors)
+    return [{str(row) for row in rows} for rows in best_rows]
+
+def measure(search: Callable[[np.ndarray], List[str]], queries: np.ndarray, truth: List[set]) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(expected & set(found[:K]))
+    return {
+        "recall@5": hits / (K * len(queries)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, metavar="N", help="Cantidad de vectores sintéticos")
+    source.add_argument("--from-chroma", metavar="PATH", help="Carpeta persistente de Chroma existente")
+    parser.add_argument("--collection", default="langchain")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rescore-factor", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=64, help="Listas IVF recorridas por consulta")
+    parser.add_argument("--ivf-lists", type=int, default=0, help="Cantidad de listas IVF (0 = automático)")
+    parser.add_argument("--skip-chroma", action="store_true", help="No construir ni medir Chroma")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_vs_"))
+    try:
+        collection: Optional[object] = None
+        if args.synthetic:
+            chunks = lambda: synthetic_chunks(args.synthetic, args.dim)
+            chroma_path = workdir / "chroma"
+            if not args.skip_chroma:
+                print(f"Construyendo Chroma con {args.synthetic} vectores...")
+                collection = build_chroma(chroma_path, chunks())
+        else:
+            chroma_path = Path(args.from_chroma)
+            collection = chromadb.PersistentClient(path=str(chroma_path)).get_collection(args.collection)
+            _, loaded = load_chroma_vectors(collection)
+            chunks = lambda: (loaded[start:start + _CHUNK] for start in range(0, len(loaded), _CHUNK))
+
+        print("Construyendo índice cuantizado...")
+        started = time.perf_counter()
+        quantized = build_quantized(workdir / "quantized", chunks(), args)
+        build_s = time.perf_counter() - started
+        flat = QuantizedVectorStore(str(workdir / "quantized"), embedding_function=None,
+                                    rescore_factor=args.rescore_factor, nprobe=0)
+        total = quantized.count()
+
+        # Consultas: vectores del corpus con ruido (simulan preguntas parecidas a un fragmento).
+        rng = np.random.default_rng(1)
+        sample = quantized.sample_vectors(args.queries, seed=1)
+        queries = _normalize(sample + 0.3 * rng.normal(size=sample.shape).astype(np.float32))
+        truth = exact_top_k(chunks(), queries)
+
+        def quantized_search(store: QuantizedVectorStore) -> Callable[[np.ndarray], List[str]]:
+            return lambda q: [d.page_content for d in store.similarity_search_by_vector(q.tolist(), k=K)]
+
+        results = []
+        if collection is not None:
+            stats = measure(
+                lambda q: collection.query(query_embeddings=[q.tolist()], n_results=K)["ids"][0], queries, truth
+            )
+            stats["disk_mb"] = _dir_size(chroma_path) / 2**20
+            stats["hot_mb"] = sum(f.stat().st_size for f in chroma_path.rglob("*.bin")) / 2**20
+            results.append(("chroma", stats))
+
+        usage = quantized.disk_usage()
+        lists = quantized.centroids()
+        for name, store in ((f"ivf/{args.nprobe}", quantized), ("flat", flat)):
+            stats = measure(quantized_search(store), queries, truth)
+            stats["disk_mb"] = sum(usage.values()) / 2**20
+            # Lo que se recorre en cada búsqueda (y tiende a quedar en RAM) es el archivo int8
+            # (con IVF, solo la fracción nprobe / listas).
+            stats["hot_mb"] = sum(size for f, size in usage.items() if f.startswith("codes.")) / 2**20
+            if store is quantized and lists is not None:
+                stats["hot_mb"] *= min(args.nprobe / len(lists), 1.0)
+            results.append((name, stats))
+
+        print(f"\nVectores: {total} x {args.dim} | consultas: {args.queries} | listas IVF: "
+              f"{len(lists) if lists is not None else 0} | alta del índice cuantizado: {build_s:.1f}s")
+        print(f"{'backend':<12}{'recall@5':>10}{'p50 ms':>10}{'p99 ms':>10}{'disco MB':>11}{'hot MB':>10}")
+        for name, stats in results:
+            print(f"{name:<12}{stats['recall@5']:>10.3f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                  f"{stats['disk_mb']:>11.1f}{stats['hot_mb']:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
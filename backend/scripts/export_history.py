@@ -0,0 +1,46 @@
+"""
+Exporta los historiales de chat y sus mensajes (con fuentes) para auditoría.
+
+Uso (desde backend/):
+    python -m scripts.export_history --start 2025-10-01 --end 2025-11-01 -o octubre.ndjson
+    python -m scripts.export_history --format columnar --after-id 150000 -o resto.ndjson
+
+La memoria se mantiene constante: las filas se leen con un cursor del lado del servidor.
+Si la exportación se corta, reanudar con --after-id usando el último id escrito.
+"""
+import argparse
+import datetime
+import sys
+
+from app.database import SessionLocal
+from app.services import export_service
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=["ndjson", "columnar"], default="ndjson")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, help="Desde (inclusive), ISO 8601")
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat, help="Hasta (exclusivo), ISO 8601")
+    parser.add_argument("--after-id", type=int, help="Reanudar después de este id de mensaje")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("-o", "--output", help="Archivo de salida (por defecto, stdout)")
+    args = parser.parse_args()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    db = SessionLocal()
+    try:
+        for line in export_service.iter_export(
+            db,
+            format=args.format,
+            start=args.start,
+            end=args.end,
+            after_id=args.after_id,
+            chunk_size=args.chunk_size
+        ):
+            output.write(line)
+    finally:
+        db.close()
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()